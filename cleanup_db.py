@@ -7,13 +7,15 @@ import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
-from data_integration.database.database import engine
+from data_integration.database.database import get_engine
+from data_integration.database.migrations import migrate
 from data_integration.database.models import Base
 def cleanup_database():
+    engine = get_engine()
     print("Dropping all tables...")
     Base.metadata.drop_all(engine)
-    print("Creating all tables...")
-    Base.metadata.create_all(engine)
+    print("Applying migrations...")
+    migrate(engine)
     print("Database reinitialized successfully!")
 if __name__ == "__main__":
     cleanup_database()
\ No newline at end of file
@@ -0,0 +1,117 @@
+'''
+Async API endpoints for the ASGI serving mode.
+Serves the user list and statistics endpoints on AsyncSession so slow
+queries wait on the event loop instead of blocking a worker thread.
+'''
+
+import asyncio
+from quart import Blueprint, jsonify, request
+from sqlalchemy import desc, func, select
+from data_integration.api.params import parse_range_args, parse_as_of_arg
+from data_integration.database.async_database import get_async_session
+from data_integration.database.models import User
+from data_integration.services.activity_service import ActivityRollupService
+from data_integration.utils.cache_manager import CUBE_DIMENSIONS, get_drilldown
+
+async_api = Blueprint('async_api', __name__)
+
+async def _count_users():
+    async with get_async_session() as session:
+        return await session.scalar(select(func.count(User.id)))
+
+async def _users_page(offset, limit):
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(User).order_by(desc(User.created_time)).offset(offset).limit(limit)
+        )
+        return [user.to_dict() for user in result.scalars()]
+
+async def _run_sync(function, *args, **kwargs):
+    """Run shared synchronous service code over an async connection"""
+    async with get_async_session() as session:
+        return await session.run_sync(lambda sync_session: function(sync_session, *args, **kwargs))
+
+@async_api.route('/api/users', methods=['GET'])
+async def get_users():
+    """Get users from the database with pagination"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        offset = (page - 1) * per_page
+
+        # The count and the page use separate connections, so they run concurrently
+        total_count, users = await asyncio.gather(_count_users(), _users_page(offset, per_page))
+
+        return jsonify({
+            'users': users,
+            'total': total_count,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total_count + per_page - 1) // per_page
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api.route('/api/activity', methods=['GET'])
+async def get_activity():
+    """Get event activity per time bucket from the pre-aggregated rollups"""
+    try:
+        start, end = parse_range_args(request.args)
+        return jsonify(await _run_sync(
+            ActivityRollupService().query_activity,
+            start,
+            end,
+            granularity=request.args.get('granularity'),
+            country=request.args.get('country'),
+            role=request.args.get('role'),
+            group_by=request.args.get('group_by')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api.route('/api/activity/unique-users', methods=['GET'])
+async def get_unique_users():
+    """Estimate distinct active users over a range by merging rollup sketches"""
+    try:
+        start, end = parse_range_args(request.args)
+        return jsonify(await _run_sync(
+            ActivityRollupService().count_unique_users,
+            start,
+            end,
+            country=request.args.get('country'),
+            role=request.args.get('role')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api.route('/api/activity/active-users', methods=['GET'])
+async def get_active_users():
+    """Get DAU/WAU/MAU estimates ending at the given day (default: today)"""
+    try:
+        as_of = parse_as_of_arg(request.args)
+        return jsonify(await _run_sync(
+            ActivityRollupService().active_user_summary,
+            as_of,
+            country=request.args.get('country'),
+            role=request.args.get('role')
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_api.route('/api/drilldown', methods=['GET'])
+async def get_drilldown_counts():
+    """Get user counts for each level of a drill path from the pre-computed cube"""
+    dimensions = [d for d in request.args.get('dimensions', ','.join(CUBE_DIMENSIONS)).split(',') if d]
+    selections = {d: request.args[d] for d in CUBE_DIMENSIONS if d in request.args}
+    try:
+        return jsonify(await _run_sync(get_drilldown, dimensions, selections))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
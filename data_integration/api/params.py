@@ -0,0 +1,28 @@
+'''
+Query parameter parsing shared by the Flask and async API endpoints.
+Kept free of framework and service imports so either server can load it
+without pulling in the other's routes.
+'''
+
+from datetime import datetime, timedelta
+
+def parse_datetime_arg(args, name, default=None):
+    """Parse an ISO-8601 query parameter into a naive UTC datetime"""
+    value = args.get(name)
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def parse_range_args(args):
+    """Parse start/end query parameters, defaulting to the last 30 days"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = parse_datetime_arg(args, 'end', today + timedelta(days=1))
+    start = parse_datetime_arg(args, 'start', end - timedelta(days=30))
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end
+
+def parse_as_of_arg(args):
+    """Parse the as_of query parameter, defaulting to the end of today"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return parse_datetime_arg(args, 'as_of', today + timedelta(days=1))
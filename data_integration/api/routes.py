@@ -4,14 +4,27 @@ Handles data requests, provides aggregated statistics,
 and manages real-time data updates.
 '''
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import json
+from data_integration.api.params import parse_range_args, parse_as_of_arg
 from data_integration.database.database import Session
 from data_integration.database.models import User
+from data_integration.services.activity_service import ActivityRollupService
+from data_integration.services.identity_service import IdentityResolutionService
+from data_integration.services.data_quality_service import DataQualityService
+from data_integration.services.event_service import get_event_buffer, validate_events
+from data_integration.services.stream_service import format_sse, get_stream_broker
+from data_integration.utils.cache_manager import CUBE_DIMENSIONS, get_drilldown
+from data_integration.utils.http_cache import generation_scope
+from data_integration.config.settings import EVENT_MAX_BATCH_SIZE, STREAM_MAX_CLIENTS
 from sqlalchemy import desc
+from werkzeug.exceptions import RequestEntityTooLarge
+import queue
 
 api = Blueprint('api', __name__)
 
 @api.route('/api/users', methods=['GET'])
+@generation_scope('users')
 def get_users():
     """Get users from the database with pagination"""
     session = Session()
@@ -43,4 +56,207 @@ def get_users():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+@api.route('/api/users/duplicates', methods=['GET'])
+@generation_scope('users')
+def get_duplicate_users():
+    """Get pre-computed clusters of users that likely share one identity"""
+    session = Session()
+    try:
+        return jsonify(IdentityResolutionService().get_duplicates(
+            session,
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 20, type=int),
+            min_size=request.args.get('min_size', 2, type=int)
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+@api.route('/api/data-quality/history', methods=['GET'])
+@generation_scope('users')
+def get_data_quality_history():
+    """Get data-quality metrics recorded after each sync, oldest first"""
+    session = Session()
+    try:
+        return jsonify({
+            'snapshots': DataQualityService.history(session, limit=request.args.get('limit', 30, type=int))
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+@api.route('/api/activity', methods=['GET'])
+@generation_scope('events')
+def get_activity():
+    """Get event activity per time bucket from the pre-aggregated rollups"""
+    try:
+        start, end = parse_range_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    session = Session()
+    try:
+        result = ActivityRollupService().query_activity(
+            session,
+            start,
+            end,
+            granularity=request.args.get('granularity'),
+            country=request.args.get('country'),
+            role=request.args.get('role'),
+            group_by=request.args.get('group_by')
+        )
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+@api.route('/api/activity/unique-users', methods=['GET'])
+@generation_scope('events')
+def get_unique_users():
+    """Estimate distinct active users over a range by merging rollup sketches"""
+    try:
+        start, end = parse_range_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    session = Session()
+    try:
+        result = ActivityRollupService().count_unique_users(
+            session,
+            start,
+            end,
+            country=request.args.get('country'),
+            role=request.args.get('role')
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+@api.route('/api/activity/active-users', methods=['GET'])
+@generation_scope('events')
+def get_active_users():
+    """Get DAU/WAU/MAU estimates ending at the given day (default: today)"""
+    try:
+        as_of = parse_as_of_arg(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    session = Session()
+    try:
+        result = ActivityRollupService().active_user_summary(
+            session,
+            as_of,
+            country=request.args.get('country'),
+            role=request.args.get('role')
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+@api.route('/api/drilldown', methods=['GET'])
+@generation_scope('users')
+def get_drilldown_counts():
+    """Get user counts for each level of a drill path from the pre-computed cube"""
+    dimensions = [d for d in request.args.get('dimensions', ','.join(CUBE_DIMENSIONS)).split(',') if d]
+    selections = {d: request.args[d] for d in CUBE_DIMENSIONS if d in request.args}
+
+    session = Session()
+    try:
+        return jsonify(get_drilldown(session, dimensions, selections))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+def _parse_event_batch():
+    """Read a JSON array (or single object) or NDJSON request body"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        return [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    payload = json.loads(request.get_data(as_text=True) or 'null')
+    if isinstance(payload, dict):
+        return [payload]
+    if not isinstance(payload, list):
+        raise ValueError("body must be a JSON array of events or NDJSON")
+    return payload
+
+@api.route('/api/events', methods=['POST'])
+def post_events():
+    """Accept a batch of events into the ingestion buffer"""
+    try:
+        raw_events = _parse_event_batch()
+    except ValueError as e:
+        return jsonify({'error': f"Invalid request body: {e}"}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"Request body exceeds {request.max_content_length} bytes"}), 413
+    if len(raw_events) > EVENT_MAX_BATCH_SIZE:
+        return jsonify({'error': f"Batch exceeds {EVENT_MAX_BATCH_SIZE} events"}), 413
+
+    events, errors = validate_events(raw_events)
+    if not events:
+        return jsonify({'error': 'No valid events', 'rejected': errors[:20]}), 400
+
+    if not get_event_buffer().offer(events):
+        response = jsonify({'error': 'Event buffer is full, retry later'})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+
+    return jsonify({
+        'accepted': len(events),
+        'rejected': len(errors),
+        'errors': errors[:20]
+    }), 202
+
+@api.route('/api/events/stats', methods=['GET'])
+def get_event_stats():
+    """Get ingestion buffer counters"""
+    return jsonify(get_event_buffer().stats())
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+@api.route('/api/stream', methods=['GET'])
+def stream_updates():
+    """Server-Sent Events stream of sync progress, user deltas and aggregates"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    broker = get_stream_broker()
+    # Every stream holds a worker thread, so leave the rest for other requests
+    if broker.subscriber_count >= STREAM_MAX_CLIENTS:
+        response = jsonify({'error': 'Too many live update streams, retry later'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    subscriber = broker.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = subscriber.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment frames keep proxies from closing idle connections
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            broker.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
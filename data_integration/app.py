@@ -4,25 +4,42 @@ Initializes the Flask application, sets up background tasks,
 and configures all necessary services.
 '''
 
-from flask import Flask, make_response, request
+from flask import Flask
 from data_integration.api.routes import api
-from data_integration.database.database import init_db
+from data_integration.config.settings import EVENT_MAX_BATCH_SIZE, EVENT_MAX_EVENT_BYTES
+from data_integration.utils.http_cache import check_not_modified, add_etag, compress_response
 
-app = Flask(__name__)
+def create_app(config=None):
+    """
+    Application factory. Creating the app never touches the database;
+    the engine is created on first use and the schema is managed by
+    `python -m data_integration.database.migrations`.
+    """
+    app = Flask(__name__)
+    # Oversized event batches are rejected with 413 before the body is read
+    app.config['MAX_CONTENT_LENGTH'] = EVENT_MAX_BATCH_SIZE * EVENT_MAX_EVENT_BYTES
+    if config:
+        app.config.update(config)
 
-@app.after_request
-def after_request(response):
-    # Allow any origin for development
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
+    @app.before_request
+    def before_request():
+        # Unchanged data is answered with 304 before the view touches the database
+        return check_not_modified()
 
-# Initialize database
-init_db()
+    @app.after_request
+    def after_request(response):
+        # Allow any origin for development
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        response.headers.add('Access-Control-Expose-Headers', 'ETag')
+        response = add_etag(response)
+        return compress_response(response)
 
-# Register blueprints
-app.register_blueprint(api)
+    # Register blueprints
+    app.register_blueprint(api)
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5002)
\ No newline at end of file
+    create_app().run(debug=True, port=5002)
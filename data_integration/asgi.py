@@ -0,0 +1,36 @@
+'''
+ASGI entry point for the async API mode.
+Serves the read endpoints with SQLAlchemy asyncio and asyncpg, e.g.:
+
+    uvicorn --factory data_integration.asgi:create_async_app --port 5003
+
+The synchronous Flask app (data_integration.app) remains the default and
+still owns sync-only endpoints such as event ingestion and the SSE stream.
+'''
+
+from quart import Quart
+from data_integration.api.async_routes import async_api
+from data_integration.database.async_database import dispose_async_engine
+
+def create_async_app(config=None):
+    """Application factory for the ASGI serving mode"""
+    app = Quart(__name__)
+    if config:
+        app.config.update(config)
+
+    @app.after_request
+    async def after_request(response):
+        # Allow any origin for development
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
+        return response
+
+    @app.after_serving
+    async def close_pool():
+        await dispose_async_engine()
+
+    # Register blueprints
+    app.register_blueprint(async_api)
+
+    return app
@@ -0,0 +1,48 @@
+'''
+Async database connection management for the ASGI serving mode.
+Shares the models in database/models.py with the synchronous API and
+talks to PostgreSQL through the asyncpg driver.
+'''
+
+"""
+Async engine and session management
+"""
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from ..config.settings import ASYNC_DATABASE_URL, ASYNC_POOL_SIZE, ASYNC_MAX_OVERFLOW
+
+_async_engine = None
+
+def get_async_engine():
+    """Create the async engine on first use, inside the running event loop"""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            pool_size=ASYNC_POOL_SIZE,
+            max_overflow=ASYNC_MAX_OVERFLOW,
+            pool_pre_ping=True
+        )
+    return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+AsyncSessionFactory = sessionmaker(class_=AsyncSession, expire_on_commit=False)
+
+@asynccontextmanager
+async def get_async_session():
+    """Async context manager for database sessions"""
+    session = AsyncSessionFactory(bind=get_async_engine())
+    try:
+        yield session
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise e
+    finally:
+        await session.close()
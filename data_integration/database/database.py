@@ -7,22 +7,43 @@ utility functions for bulk operations and optimized queries.
 """
 Database connection and session management
 """
+import csv
+import io
+import json
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from contextlib import contextmanager
 from ..config.settings import DATABASE_URL
-from .models import Base
 
-# Create engine
-engine = create_engine(DATABASE_URL)
+_engine = None
+_engine_lock = threading.Lock()
 
-# Create session factory
-SessionFactory = sessionmaker(bind=engine)
-Session = scoped_session(SessionFactory)
+def get_engine():
+    """Create the engine on first use so importing the app never opens a connection"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL)
+    return _engine
+
+def __getattr__(name):
+    # Keeps `from ...database import engine` working without eager creation
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Create session factory; sessions bind to the engine when first created
+SessionFactory = sessionmaker()
+Session = scoped_session(lambda: SessionFactory(bind=get_engine()))
 
 def init_db():
-    """Initialize the database schema"""
-    Base.metadata.create_all(engine)
+    """Bring the database schema up to date by applying pending migrations"""
+    from .migrations import migrate
+    return migrate(get_engine())
 
 @contextmanager
 def get_db_session():
@@ -35,4 +56,63 @@ def get_db_session():
         session.rollback()
         raise e
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def bulk_upsert_users(session, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Insert or update users by (project_id, login_id). Rows are streamed with COPY into a
+    temporary staging table and merged with a single INSERT ... ON CONFLICT.
+    Returns (inserted, updated) counts.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement; the last record wins
+    unique_rows = list({(row['project_id'], row['login_id']): row for row in rows}.values())
+    if not unique_rows:
+        return 0, 0
+    now = datetime.utcnow().isoformat()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in unique_rows:
+        created_time = row.get('created_time')
+        # An unquoted empty field loads as NULL, which created_time needs when unknown
+        writer.writerow([row['project_id'], row['login_id'], row['email'],
+                         created_time.isoformat() if created_time else '', row['country'],
+                         row['user_roles'], json.dumps(row['raw_data']), now])
+    buffer.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS users_staging (
+                project_id VARCHAR, login_id VARCHAR, email VARCHAR, created_time TIMESTAMP,
+                country VARCHAR, user_roles VARCHAR, raw_data JSON, last_sync TIMESTAMP
+            ) ON COMMIT DELETE ROWS
+        """)
+        cursor.execute("TRUNCATE users_staging")
+        cursor.copy_expert(
+            "COPY users_staging (project_id, login_id, email, created_time, country, user_roles, raw_data, last_sync) "
+            # Empty strings stay '' like in sync_users_to_db instead of loading as NULL
+            "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (email, country, user_roles))",
+            buffer
+        )
+        # xmax is 0 only for freshly inserted rows
+        cursor.execute("""
+            WITH upserted AS (
+                INSERT INTO users (project_id, login_id, email, created_time, country, user_roles,
+                                   raw_data, last_sync)
+                SELECT project_id, login_id, email, created_time, country, user_roles, raw_data, last_sync
+                FROM users_staging
+                ON CONFLICT (project_id, login_id) DO UPDATE SET
+                    email = EXCLUDED.email,
+                    created_time = EXCLUDED.created_time,
+                    country = EXCLUDED.country,
+                    user_roles = EXCLUDED.user_roles,
+                    raw_data = EXCLUDED.raw_data,
+                    last_sync = EXCLUDED.last_sync
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted
+        """)
+        inserted, updated = cursor.fetchone()
+    finally:
+        cursor.close()
+    return inserted, updated
@@ -0,0 +1,254 @@
+'''
+Versioned schema migrations.
+Replaces create_all at startup with an explicit upgrade step that compares
+the version stored in the schema_version table with the latest migration.
+'''
+
+"""
+Schema migration runner
+
+Usage:
+    python -m data_integration.database.migrations          # apply pending migrations
+    python -m data_integration.database.migrations --check  # exit 1 if any are pending
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, JSON,
+    LargeBinary, MetaData, String, Table, UniqueConstraint, inspect, text
+)
+from ..config.settings import DESCOPE_PROJECT_ID
+
+logger = logging.getLogger(__name__)
+
+# Serializes concurrent migration runs (e.g. several workers deploying at once)
+MIGRATION_LOCK_ID = 72610032
+
+# Tables as each migration created them. They are frozen copies rather than
+# models.py's tables, so a migration's effect never changes when the models do;
+# later schema changes go in new migrations.
+_schema = MetaData()
+
+_schema_version = Table(
+    'schema_version', _schema,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime),
+)
+
+# Migration 1
+_users_v1 = Table(
+    'users', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('login_id', String, nullable=False),
+    Column('email', String),
+    Column('created_time', DateTime),
+    Column('country', String),
+    Column('user_roles', String),
+    Column('raw_data', JSON),
+    Column('last_sync', DateTime),
+    Index('ix_users_login_id', 'login_id', unique=True),
+    Index('ix_users_email', 'email'),
+)
+_events_v1 = Table(
+    'events', _schema,
+    Column('id', BigInteger, primary_key=True, autoincrement=True),
+    Column('login_id', String, nullable=False),
+    Column('event_type', String, nullable=False),
+    Column('occurred_at', DateTime, primary_key=True, nullable=False),
+    Column('properties', JSON),
+    Index('ix_events_occurred_at', 'occurred_at'),
+    Index('ix_events_login_id_occurred_at', 'login_id', 'occurred_at'),
+    postgresql_partition_by='RANGE (occurred_at)',
+)
+_activity_rollups_v1 = Table(
+    'activity_rollups', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('granularity', String, nullable=False),
+    Column('bucket_start', DateTime, nullable=False),
+    Column('country', String, nullable=False),
+    Column('role', String, nullable=False),
+    Column('event_count', Integer, nullable=False),
+    Column('active_users', Integer, nullable=False),
+    Column('user_sketch', LargeBinary),
+    Column('updated_at', DateTime),
+    UniqueConstraint('granularity', 'bucket_start', 'country', 'role', name='uq_activity_rollups_cell'),
+)
+_user_cube_v1 = Table(
+    'user_cube', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('grouping', String, nullable=False),
+    Column('country', String),
+    Column('role', String),
+    Column('signup_month', String),
+    Column('user_count', Integer, nullable=False),
+    Column('refreshed_at', DateTime),
+    Index('ix_user_cube_slice', 'grouping', 'country', 'role', 'signup_month'),
+)
+_data_generations_v1 = Table(
+    'data_generations', _schema,
+    Column('scope', String, primary_key=True),
+    Column('generation', BigInteger, nullable=False),
+    Column('updated_at', DateTime),
+)
+
+# Migration 2
+_identity_keys_v2 = Table(
+    'identity_keys', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('key_type', String, nullable=False),
+    Column('key_value', String, nullable=False),
+    Index('ix_identity_keys_user_id', 'user_id'),
+    Index('ix_identity_keys_key', 'key_type', 'key_value'),
+)
+_duplicate_cluster_members_v2 = Table(
+    'duplicate_cluster_members', _schema,
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('cluster_id', Integer, nullable=False),
+    Column('cluster_size', Integer, nullable=False),
+    Column('matched_on', String, nullable=False),
+    Index('ix_duplicate_cluster_members_cluster_id', 'cluster_id'),
+)
+
+# Migration 4
+_data_quality_snapshots_v4 = Table(
+    'data_quality_snapshots', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('total_users', Integer, nullable=False),
+    Column('email_null_rate', Float, nullable=False),
+    Column('country_null_rate', Float, nullable=False),
+    Column('roles_null_rate', Float, nullable=False),
+    Column('duplicate_email_users', Integer, nullable=False),
+    Column('metrics', JSON, nullable=False),
+    Column('sync_result', JSON),
+    Column('snapshot_path', String),
+    Index('ix_data_quality_snapshots_created_at', 'created_at'),
+)
+
+# Migration 5
+_sync_runs_v5 = Table(
+    'sync_runs', _schema,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('finished_at', DateTime, nullable=False),
+    Column('total_processed', Integer, nullable=False),
+    Column('synced', Integer, nullable=False),
+    Column('errors', Integer, nullable=False),
+    Column('result', JSON, nullable=False),
+    Column('profile', JSON),
+    Index('ix_sync_runs_finished_at', 'finished_at'),
+)
+
+
+def _baseline(connection):
+    # Idempotent, so databases created by the old create_all at import time adopt it
+    _schema.create_all(connection, tables=[
+        _users_v1, _events_v1, _activity_rollups_v1, _user_cube_v1, _data_generations_v1
+    ])
+
+
+def _identity_resolution(connection):
+    _schema.create_all(connection, tables=[_identity_keys_v2, _duplicate_cluster_members_v2])
+
+
+def _multi_project(connection):
+    connection.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS project_id VARCHAR NOT NULL DEFAULT ''"))
+    # Users synced before multi-project support all came from the original project
+    connection.execute(text("UPDATE users SET project_id = :project_id WHERE project_id = ''"),
+                       {'project_id': DESCOPE_PROJECT_ID})
+    # login_id was unique on its own; it is now unique per project
+    connection.execute(text("DROP INDEX IF EXISTS ix_users_login_id"))
+    connection.execute(text("CREATE INDEX ix_users_login_id ON users (login_id)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_users_project_id ON users (project_id)"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_users_project_login ON users (project_id, login_id)"
+    ))
+
+
+def _data_quality(connection):
+    _data_quality_snapshots_v4.create(connection, checkfirst=True)
+
+
+def _sync_runs(connection):
+    _sync_runs_v5.create(connection, checkfirst=True)
+
+
+# Append new migrations here; never edit or reorder applied ones
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Baseline schema: users, events, rollups, cube and generations', _baseline),
+    (2, 'Identity resolution keys and duplicate clusters', _identity_resolution),
+    (3, 'Multi-project users: project_id in the unique key', _multi_project),
+    (4, 'Data-quality snapshot history', _data_quality),
+    (5, 'Sync run history with optional stage profiles', _sync_runs),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection) -> int:
+    """Highest applied migration, 0 for a database never migrated"""
+    if not inspect(connection).has_table(_schema_version.name):
+        return 0
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def pending_migrations(engine) -> List[Tuple[int, str, Callable]]:
+    with engine.connect() as connection:
+        version = current_version(connection)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def migrate(engine) -> List[int]:
+    """
+    Apply pending migrations in order inside one transaction, so a failed
+    migration leaves the schema and its recorded version unchanged
+    """
+    applied = []
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': MIGRATION_LOCK_ID})
+        _schema_version.create(connection, checkfirst=True)
+        version = current_version(connection)
+        for number, description, upgrade in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"Applying migration {number}: {description}")
+            upgrade(connection)
+            connection.execute(_schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.utcnow()
+            ))
+            applied.append(number)
+    if applied:
+        logger.info(f"Schema migrated to version {applied[-1]}")
+    else:
+        logger.info(f"Schema is up to date at version {LATEST_VERSION}")
+    return applied
+
+
+def main():
+    from .database import get_engine
+
+    parser = argparse.ArgumentParser(description='Apply database schema migrations')
+    parser.add_argument('--check', action='store_true',
+                        help='Only report pending migrations; exit 1 if any')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.check:
+        pending = pending_migrations(get_engine())
+        for number, description, _ in pending:
+            print(f"Pending migration {number}: {description}")
+        if not pending:
+            print(f"Schema is up to date at version {LATEST_VERSION}")
+        return 1 if pending else 0
+
+    migrate(get_engine())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,23 +7,29 @@ and data structures.
 """
 Database models for the data integration system
 """
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, Boolean, Index, UniqueConstraint, LargeBinary, ForeignKey, Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 Base = declarative_base()
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    login_id = Column(String, unique=True, nullable=False, index=True)
+    project_id = Column(String, nullable=False, server_default='', index=True)  # Descope project the user belongs to
+    login_id = Column(String, nullable=False, index=True)
     email = Column(String, index=True)
     created_time = Column(DateTime)
     country = Column(String)
     user_roles = Column(String)  # Store roles as comma-separated string
     raw_data = Column(JSON)      # Store complete Descope data for reference
     last_sync = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        # Login IDs are only unique within a Descope project
+        Index('uq_users_project_login', 'project_id', 'login_id', unique=True),
+    )
     def to_dict(self):
         return {
             'id': self.id,
+            'project_id': self.project_id,
             'login_id': self.login_id,
             'email': self.email,
             'created_time': self.created_time.isoformat() if self.created_time else None,
@@ -56,3 +62,129 @@ class User(Base):
             user_roles=roles_str,
             raw_data=user_data
         )
+
+class Event(Base):
+    """Tracked user event, range-partitioned by month on occurred_at in PostgreSQL"""
+    __tablename__ = 'events'
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    login_id = Column(String, nullable=False)
+    event_type = Column(String, nullable=False)
+    # Part of the primary key because PostgreSQL requires it for partitioned tables
+    occurred_at = Column(DateTime, primary_key=True, nullable=False)
+    properties = Column(JSON)
+    __table_args__ = (
+        Index('ix_events_occurred_at', 'occurred_at'),
+        Index('ix_events_login_id_occurred_at', 'login_id', 'occurred_at'),
+        {'postgresql_partition_by': 'RANGE (occurred_at)'},
+    )
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'login_id': self.login_id,
+            'event_type': self.event_type,
+            'occurred_at': self.occurred_at.isoformat() if self.occurred_at else None,
+            'properties': self.properties
+        }
+class ActivityRollup(Base):
+    """Pre-aggregated event activity per time bucket, country and role set"""
+    __tablename__ = 'activity_rollups'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String, nullable=False)   # 'hour', 'day' or 'month'
+    bucket_start = Column(DateTime, nullable=False)
+    country = Column(String, nullable=False, default='')
+    role = Column(String, nullable=False, default='')  # Sorted, comma-separated role set
+    event_count = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    user_sketch = Column(LargeBinary)  # Serialized HyperLogLog of login IDs, mergeable across cells
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        UniqueConstraint('granularity', 'bucket_start', 'country', 'role',
+                         name='uq_activity_rollups_cell'),
+    )
+    def to_dict(self):
+        return {
+            'granularity': self.granularity,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'country': self.country,
+            'role': self.role,
+            'event_count': self.event_count,
+            'active_users': self.active_users
+        }
+class UserCube(Base):
+    """Pre-computed user counts for every grouping set of the drill-down dimensions"""
+    __tablename__ = 'user_cube'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    grouping = Column(String, nullable=False)  # Sorted, comma-separated grouped dimensions
+    country = Column(String)                   # NULL when not part of the grouping
+    role = Column(String)
+    signup_month = Column(String)              # 'YYYY-MM', '' when unknown
+    user_count = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index('ix_user_cube_slice', 'grouping', 'country', 'role', 'signup_month'),
+    )
+class DataGeneration(Base):
+    """Monotonic change counter per data scope, bumped whenever that data is committed"""
+    __tablename__ = 'data_generations'
+    scope = Column(String, primary_key=True)   # 'users' or 'events'
+    generation = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+class SchemaVersion(Base):
+    """Applied schema migrations, see database/migrations.py"""
+    __tablename__ = 'schema_version'
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+class IdentityKey(Base):
+    """Blocking key derived from a user's email, name or social login, used to find duplicates"""
+    __tablename__ = 'identity_keys'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    key_type = Column(String, nullable=False)   # 'email', 'name' or 'social'
+    key_value = Column(String, nullable=False)
+    __table_args__ = (
+        Index('ix_identity_keys_key', 'key_type', 'key_value'),
+    )
+class DuplicateClusterMember(Base):
+    """Pre-computed membership of a user in a cluster of candidate duplicates"""
+    __tablename__ = 'duplicate_cluster_members'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    cluster_id = Column(Integer, nullable=False, index=True)  # Lowest user id in the cluster
+    cluster_size = Column(Integer, nullable=False)
+    matched_on = Column(String, nullable=False)  # Comma-separated key types linking the cluster
+class DataQualitySnapshot(Base):
+    """Data-quality metrics of the users table recorded after each sync"""
+    __tablename__ = 'data_quality_snapshots'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    total_users = Column(Integer, nullable=False)
+    email_null_rate = Column(Float, nullable=False)
+    country_null_rate = Column(Float, nullable=False)
+    roles_null_rate = Column(Float, nullable=False)
+    duplicate_email_users = Column(Integer, nullable=False)
+    metrics = Column(JSON, nullable=False)      # Full report: histograms, sources, duplicates
+    sync_result = Column(JSON)                  # Result of the sync that triggered the snapshot
+    snapshot_path = Column(String)              # Parquet file written alongside, if any
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat(),
+            'total_users': self.total_users,
+            'email_null_rate': self.email_null_rate,
+            'country_null_rate': self.country_null_rate,
+            'roles_null_rate': self.roles_null_rate,
+            'duplicate_email_users': self.duplicate_email_users,
+            'metrics': self.metrics,
+            'sync_result': self.sync_result,
+            'snapshot_path': self.snapshot_path
+        }
+class SyncRun(Base):
+    """Outcome of one Descope sync, with its stage profile when profiling was on"""
+    __tablename__ = 'sync_runs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    finished_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    total_processed = Column(Integer, nullable=False)
+    synced = Column(Integer, nullable=False)
+    errors = Column(Integer, nullable=False)
+    result = Column(JSON, nullable=False)   # Full result, including per-project results
+    profile = Column(JSON)                  # Stage timings, round trips and peak memory
@@ -0,0 +1,30 @@
+'''
+Script to backfill users from an exported Descope user dump.
+Accepts a JSON array, a {"users": [...]} document or NDJSON, and loads it
+through the same normalization as the live Descope sync.
+'''
+
+import argparse
+import json
+import logging
+import sys
+from data_integration.services.export_backfill_service import ExportBackfillService, FORMATS, BACKFILL_BATCH_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill users from a Descope export file')
+    parser.add_argument('path', help='Export file (JSON or NDJSON)')
+    parser.add_argument('--format', choices=FORMATS, default='auto')
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument('--limit', type=int, help='Stop after this many records')
+    parser.add_argument('--workers', type=int, help='Normalization processes (default: CPU count)')
+    parser.add_argument('--project-id', help='Descope project the export belongs to (default: first configured)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    service = ExportBackfillService(batch_size=args.batch_size, workers=args.workers, project_id=args.project_id)
+    result = service.backfill(args.path, args.format, args.limit)
+    print(json.dumps(result, indent=2))
+    return 1 if result['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
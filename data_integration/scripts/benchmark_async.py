@@ -0,0 +1,102 @@
+'''
+Load benchmark comparing the sync (Flask/WSGI) and async (Quart/ASGI) API modes.
+Simulates concurrent dashboard clients issuing the user list and statistics
+requests against running servers and reports throughput and latency.
+
+Start both servers against the same local PostgreSQL first, e.g.:
+
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:5002 'data_integration.app:create_app()'
+    uvicorn --factory data_integration.asgi:create_async_app --port 5003 --workers 4
+'''
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+DASHBOARD_PATHS = [
+    '/api/users?page={page}&per_page=50',
+    '/api/drilldown?dimensions=country,role',
+    '/api/activity',
+    '/api/activity/active-users',
+]
+
+async def http_get(reader, writer, host, path):
+    """Issue one keep-alive GET and return the status code"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length = None
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        raise ConnectionError("response without Content-Length")
+    await reader.readexactly(length)
+    return status
+
+async def dashboard_client(base_url, deadline, latencies, failures):
+    parts = urlsplit(base_url)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = random.choice(DASHBOARD_PATHS).format(page=random.randint(1, 20))
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+            status = await http_get(reader, writer, parts.netloc, path)
+            if status >= 500:
+                failures.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            failures.append(None)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+async def run_level(base_url, clients, duration):
+    latencies, failures = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(dashboard_client(base_url, deadline, latencies, failures) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan'),
+        'failures': len(failures)
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description='Compare sync and async API throughput')
+    parser.add_argument('--sync-url', default='http://127.0.0.1:5002')
+    parser.add_argument('--async-url', default='http://127.0.0.1:5003')
+    parser.add_argument('--clients', default='100,250,500,1000',
+                        help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    print(f"{'Mode':<6} {'Clients':>7} {'Requests':>9} {'Req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'Failed':>7}")
+    for clients in (int(c) for c in args.clients.split(',')):
+        for mode, url in (('sync', args.sync_url), ('async', args.async_url)):
+            result = await run_level(url, clients, args.duration)
+            print(f"{mode:<6} {clients:>7} {result['requests']:>9} {result['rps']:>8.0f} "
+                  f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['failures']:>7}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
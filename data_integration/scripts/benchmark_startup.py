@@ -0,0 +1,71 @@
+'''
+Benchmark for application cold start.
+Imports and creates the app in fresh interpreters and attributes the
+import time to the main packages using `python -X importtime`.
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_CODE = "from data_integration.app import create_app; create_app()"
+PACKAGES = ['flask', 'werkzeug', 'jinja2', 'sqlalchemy', 'psycopg2', 'numpy', 'dotenv', 'data_integration']
+
+def run_once(env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+                            env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, parse_importtime(result.stderr)
+
+def parse_importtime(output):
+    """Self import time in seconds, summed per top-level package"""
+    totals = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            self_time = int(parts[0])
+        except ValueError:
+            continue  # Header line
+        package = parts[2].strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + self_time / 1e6
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app cold start time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', default='postgresql://nobody@127.0.0.1:1/unreachable',
+                        help='Defaults to an unreachable database to prove startup does not connect')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        env.get('PYTHONPATH')
+    ]))
+
+    wall_times, imports = [], []
+    for _ in range(args.runs):
+        elapsed, totals = run_once(env)
+        wall_times.append(elapsed)
+        imports.append(totals)
+
+    print(f"Cold start (interpreter + import + create_app): "
+          f"median {statistics.median(wall_times) * 1000:.0f}ms over {args.runs} runs")
+    print(f"{'Package':<20} {'Import ms':>10}")
+    for package in PACKAGES + ['(other)']:
+        if package == '(other)':
+            values = [sum(v for k, v in totals.items() if k not in PACKAGES) for totals in imports]
+        else:
+            values = [totals.get(package, 0.0) for totals in imports]
+        print(f"{package:<20} {statistics.median(values) * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
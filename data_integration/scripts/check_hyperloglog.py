@@ -0,0 +1,41 @@
+'''
+Script to check HyperLogLog accuracy against exact distinct counts.
+Builds sketches over synthetic login IDs, merges them the way the activity
+rollups do, and reports the relative error of every estimate.
+'''
+
+import random
+import sys
+from data_integration.utils.hyperloglog import HyperLogLog
+
+CARDINALITIES = [10, 100, 1000, 5000, 20000, 100000, 500000]
+
+def check_cardinality(cardinality, partitions=7, seed=0):
+    """Estimate one synthetic population split across several merged sketches"""
+    rng = random.Random(seed)
+    login_ids = [f"user-{rng.getrandbits(64):016x}" for _ in range(cardinality)]
+    exact = len(set(login_ids))
+
+    merged = HyperLogLog()
+    for i in range(partitions):
+        sketch = HyperLogLog()
+        # Overlapping slices mimic users active on several days
+        sketch.add_many(login_ids[i::partitions] + login_ids[:cardinality // 10])
+        merged.merge(HyperLogLog.from_bytes(sketch.to_bytes()))
+
+    estimate = merged.count()
+    return exact, estimate, abs(estimate - exact) / exact
+
+def main():
+    bound = 3 * HyperLogLog().relative_error
+    failures = 0
+    print(f"{'Exact':>10} {'Estimate':>10} {'Error':>8}   (3-sigma bound {bound:.1%})")
+    for seed, cardinality in enumerate(CARDINALITIES):
+        exact, estimate, error = check_cardinality(cardinality, seed=seed)
+        status = 'ok' if error <= bound else 'FAIL'
+        failures += status == 'FAIL'
+        print(f"{exact:>10} {estimate:>10} {error:>8.2%}   {status}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
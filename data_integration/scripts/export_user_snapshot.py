@@ -0,0 +1,31 @@
+'''
+Script to write a Parquet snapshot of the users table and print its
+data-quality report. With --record the report is also appended to the
+data-quality history, as after a sync.
+'''
+
+import argparse
+import json
+import logging
+import sys
+from data_integration.database.database import get_db_session
+from data_integration.services.data_quality_service import DataQualityService
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a users snapshot and data-quality report')
+    parser.add_argument('--output', help='Parquet file to write (default: a timestamped file in SNAPSHOT_DIR)')
+    parser.add_argument('--record', action='store_true', help='Append the report to the data-quality history')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    with get_db_session() as session:
+        service = DataQualityService()
+        if args.record:
+            report = service.record_snapshot(session, path=args.output)
+        else:
+            report = service.report(session, args.output)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
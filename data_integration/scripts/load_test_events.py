@@ -0,0 +1,89 @@
+'''
+Load test for the event ingestion endpoint.
+Posts batches of synthetic events from concurrent clients and reports
+accepted throughput, 429 backpressure rate and writer progress.
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+# Targets for a single API process against a local PostgreSQL
+TARGET_ACCEPT_RATE = 50000   # events/s accepted by POST /api/events
+TARGET_FLUSH_RATE = 20000    # events/s written by the background writer
+
+def make_batch(batch_size, users, ndjson):
+    now = datetime.utcnow()
+    events = [
+        {
+            'login_id': f"user{random.randrange(users)}",
+            'event_type': random.choice(['login', 'view', 'export', 'share']),
+            'occurred_at': (now - timedelta(seconds=random.randrange(86400))).isoformat()
+        }
+        for _ in range(batch_size)
+    ]
+    if ndjson:
+        return '\n'.join(json.dumps(e) for e in events).encode(), 'application/x-ndjson'
+    return json.dumps(events).encode(), 'application/json'
+
+def client(url, duration, batch_size, users, ndjson, counters, lock):
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        body, content_type = make_batch(batch_size, users, ndjson)
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(request) as response:
+                accepted = json.loads(response.read())['accepted']
+            with lock:
+                counters['accepted'] += accepted
+        except urllib.error.HTTPError as e:
+            with lock:
+                counters['throttled' if e.code == 429 else 'errors'] += 1
+            if e.code == 429:
+                time.sleep(float(e.headers.get('Retry-After', 1)))
+
+def get_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/api/events/stats") as response:
+        return json.loads(response.read())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default='http://127.0.0.1:5002')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--ndjson', action='store_true')
+    args = parser.parse_args()
+
+    counters = {'accepted': 0, 'throttled': 0, 'errors': 0}
+    lock = threading.Lock()
+    flushed_before = get_stats(args.url)['flushed']
+    started = time.time()
+    threads = [
+        threading.Thread(target=client, args=(f"{args.url}/api/events", args.duration, args.batch_size,
+                                              args.users, args.ndjson, counters, lock))
+        for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    stats = get_stats(args.url)
+
+    accept_rate = counters['accepted'] / elapsed
+    flush_rate = (stats['flushed'] - flushed_before) / elapsed
+    print(f"Clients: {args.clients}, batch size: {args.batch_size}, duration: {elapsed:.1f}s")
+    print(f"Accepted: {counters['accepted']} events ({accept_rate:,.0f}/s, target {TARGET_ACCEPT_RATE:,}/s)")
+    print(f"Flushed:  {stats['flushed'] - flushed_before} events ({flush_rate:,.0f}/s, target {TARGET_FLUSH_RATE:,}/s)")
+    print(f"Throttled (429): {counters['throttled']} requests, errors: {counters['errors']}")
+    print(f"Pending in buffer: {stats['pending']}/{stats['capacity']}")
+
+if __name__ == '__main__':
+    main()
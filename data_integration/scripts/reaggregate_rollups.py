@@ -0,0 +1,64 @@
+'''
+Script to rebuild activity rollup buckets from the raw events, e.g. after
+late events, deleted events or changes to users' country or roles.
+Rebuilds either the given buckets of one granularity or every bucket
+overlapping a start/end range.
+'''
+
+import argparse
+import json
+import logging
+import sys
+from sqlalchemy import text
+from data_integration.database.database import get_db_session
+from data_integration.services.activity_service import ActivityRollupService, GRANULARITIES, iter_buckets
+from data_integration.services.event_service import EVENT_WRITER_LOCK_ID, parse_occurred_at
+from data_integration.utils.http_cache import bump_generation
+
+def parse_datetime(value):
+    try:
+        return parse_occurred_at(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO-8601 datetime: {value!r}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-aggregate activity rollups from raw events')
+    parser.add_argument('--granularity', choices=GRANULARITIES,
+                        help='Rollup granularity (required with --bucket; default with a range: all)')
+    parser.add_argument('--bucket', dest='buckets', action='append', type=parse_datetime, default=[],
+                        help='Any time inside a bucket to rebuild; repeatable')
+    parser.add_argument('--start', type=parse_datetime, help='Start of the range to rebuild')
+    parser.add_argument('--end', type=parse_datetime, help='End of the range to rebuild (exclusive)')
+    args = parser.parse_args(argv)
+    if args.buckets:
+        if args.granularity is None:
+            parser.error('--bucket requires --granularity')
+        if args.start or args.end:
+            parser.error('use either --bucket or --start/--end')
+    elif args.start is None or args.end is None:
+        parser.error('give --bucket values or both --start and --end')
+    elif args.start >= args.end:
+        parser.error('--start must be before --end')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    service = ActivityRollupService()
+    with get_db_session() as session:
+        postgresql = session.bind.dialect.name == 'postgresql'
+        if postgresql:
+            # Keeps the event writer from folding chunks into buckets being rebuilt
+            session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': EVENT_WRITER_LOCK_ID})
+        if args.buckets:
+            cells = service.reaggregate_buckets(session, args.granularity, args.buckets)
+        elif args.granularity:
+            cells = service.reaggregate_buckets(
+                session, args.granularity, iter_buckets(args.start, args.end, args.granularity)
+            )
+        else:
+            cells = service.reaggregate_range(session, args.start, args.end)
+        if postgresql:
+            bump_generation(session, 'events')
+    print(json.dumps({'cells': cells}))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,397 @@
+'''
+Service maintaining pre-aggregated activity rollups from ingested events.
+Keeps hour/day/month rollups keyed by (bucket, country, role) up to date
+as event chunks land, and answers dashboard activity queries from them.
+'''
+
+"""
+Service for incremental activity rollups
+"""
+from datetime import datetime, timedelta
+import logging
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from sqlalchemy import func, or_
+from ..database.models import User, Event, ActivityRollup
+from ..utils.hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Ordered from finest to coarsest
+GRANULARITIES = ('hour', 'day', 'month')
+
+# Maximum number of bind parameters used for a single IN (...) lookup
+LOOKUP_BATCH_SIZE = 5000
+
+
+def truncate_to_bucket(value: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket"""
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'month':
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_bucket(bucket_start: datetime, granularity: str) -> datetime:
+    """Return the start of the bucket following bucket_start"""
+    if granularity == 'hour':
+        return bucket_start + timedelta(hours=1)
+    if granularity == 'day':
+        return bucket_start + timedelta(days=1)
+    if granularity == 'month':
+        if bucket_start.month == 12:
+            return bucket_start.replace(year=bucket_start.year + 1, month=1)
+        return bucket_start.replace(month=bucket_start.month + 1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def iter_buckets(start: datetime, end: datetime, granularity: str) -> Iterable[datetime]:
+    """Yield the start of every bucket overlapping [start, end)"""
+    bucket = truncate_to_bucket(start, granularity)
+    while bucket < end:
+        yield bucket
+        bucket = next_bucket(bucket, granularity)
+
+
+def choose_granularity(start: datetime, end: datetime) -> str:
+    """
+    Pick the coarsest rollup whose buckets exactly cover [start, end)
+    """
+    for granularity in reversed(GRANULARITIES):
+        if (truncate_to_bucket(start, granularity) == start
+                and truncate_to_bucket(end, granularity) == end):
+            return granularity
+    return GRANULARITIES[0]
+
+
+def decompose_range(start: datetime, end: datetime) -> Dict[str, List[datetime]]:
+    """
+    Split an hour-aligned [start, end) into the fewest whole buckets,
+    using months in the middle and days/hours only at the edges
+    """
+    buckets = {granularity: [] for granularity in GRANULARITIES}
+
+    def cover(lo: datetime, hi: datetime, level: int):
+        granularity = GRANULARITIES[level]
+        if level == 0:
+            buckets[granularity].extend(iter_buckets(lo, hi, granularity))
+            return
+        first = truncate_to_bucket(lo, granularity)
+        if first < lo:
+            first = next_bucket(first, granularity)
+        last = truncate_to_bucket(hi, granularity)
+        if first >= last:
+            cover(lo, hi, level - 1)
+            return
+        cover(lo, first, level - 1)
+        buckets[granularity].extend(iter_buckets(first, last, granularity))
+        cover(last, hi, level - 1)
+
+    if start < end:
+        cover(start, end, len(GRANULARITIES) - 1)
+    return buckets
+
+
+def normalize_roles(user_roles: Optional[str]) -> str:
+    """Normalize a comma-separated role string into a sorted role set key"""
+    if not user_roles:
+        return ''
+    roles = {role.strip() for role in user_roles.split(',') if role.strip()}
+    return ','.join(sorted(roles))
+
+
+def _chunked(items: List[Any], size: int = LOOKUP_BATCH_SIZE) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ActivityRollupService:
+    """
+    Maintains ActivityRollup rows incrementally.
+
+    Each rollup cell is keyed by (granularity, bucket_start, country, role),
+    where role is the user's full, normalized role set. Every user falls in
+    exactly one cell per bucket, so cells can be summed within a bucket
+    without double counting.
+    """
+
+    def load_dimensions(self, session, login_ids: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """Look up (country, role set) for the given users in batched queries"""
+        login_ids = list(set(login_ids))
+        dimensions = {}
+        for batch in _chunked(login_ids):
+            rows = session.query(User.login_id, User.country, User.user_roles)\
+                .filter(User.login_id.in_(batch))\
+                .all()
+            for login_id, country, user_roles in rows:
+                dimensions[login_id] = (country or '', normalize_roles(user_roles))
+        return dimensions
+
+    def record_events(self, session, events: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Insert a chunk of events and fold it into the rollups
+        in the caller's transaction
+        """
+        rows = [
+            Event(
+                login_id=event['login_id'],
+                event_type=event['event_type'],
+                occurred_at=event['occurred_at'],
+                properties=event.get('properties')
+            )
+            for event in events
+        ]
+        session.add_all(rows)
+        session.flush()
+        return self.apply_event_chunk(session, rows)
+
+    def apply_event_chunk(self, session, events: List[Event]) -> Dict[str, int]:
+        """
+        Incrementally update rollups for a chunk of already-flushed events.
+
+        Event counts are additive. Active users are incremented only for users
+        that had no earlier event (lower id) in the same bucket, so chunks must
+        be applied in id order by a single writer. Late events fall into older
+        buckets and are handled the same way.
+        """
+        if not events:
+            return {'events': 0, 'cells': 0}
+
+        dimensions = self.load_dimensions(session, (e.login_id for e in events))
+        chunk_min_id = min(e.id for e in events)
+        cells_written = 0
+
+        for granularity in GRANULARITIES:
+            event_counts: Dict[Tuple[datetime, str, str], int] = {}
+            cell_users: Dict[Tuple[datetime, str, str], set] = {}
+            bucket_users: Dict[datetime, set] = {}
+            for event in events:
+                bucket = truncate_to_bucket(event.occurred_at, granularity)
+                country, role = dimensions.get(event.login_id, ('', ''))
+                key = (bucket, country, role)
+                event_counts[key] = event_counts.get(key, 0) + 1
+                cell_users.setdefault(key, set()).add(event.login_id)
+                bucket_users.setdefault(bucket, set()).add(event.login_id)
+
+            new_users: Dict[Tuple[datetime, str, str], int] = {}
+            for bucket, login_ids in bucket_users.items():
+                seen = self._users_seen_before(session, granularity, bucket,
+                                               login_ids, chunk_min_id)
+                for login_id in login_ids - seen:
+                    country, role = dimensions.get(login_id, ('', ''))
+                    key = (bucket, country, role)
+                    new_users[key] = new_users.get(key, 0) + 1
+
+            existing = self._load_cells(session, granularity, list(bucket_users))
+            for key, count in event_counts.items():
+                cell = existing.get(key)
+                if cell is None:
+                    bucket, country, role = key
+                    cell = ActivityRollup(
+                        granularity=granularity,
+                        bucket_start=bucket,
+                        country=country,
+                        role=role,
+                        event_count=0,
+                        active_users=0
+                    )
+                    session.add(cell)
+                cell.event_count += count
+                cell.active_users += new_users.get(key, 0)
+                sketch = HyperLogLog.from_bytes(cell.user_sketch) if cell.user_sketch else HyperLogLog()
+                sketch.add_many(cell_users[key])
+                cell.user_sketch = sketch.to_bytes()
+                cells_written += 1
+
+        session.flush()
+        return {'events': len(events), 'cells': cells_written}
+
+    def reaggregate_buckets(self, session, granularity: str, bucket_starts: Iterable[datetime]) -> int:
+        """
+        Rebuild the given buckets from raw events, e.g. after late data,
+        deleted events or user dimension changes
+        """
+        cells_written = 0
+        for bucket in sorted({truncate_to_bucket(b, granularity) for b in bucket_starts}):
+            bucket_end = next_bucket(bucket, granularity)
+            session.query(ActivityRollup)\
+                .filter(ActivityRollup.granularity == granularity,
+                        ActivityRollup.bucket_start == bucket)\
+                .delete(synchronize_session=False)
+
+            # One row per active user keeps the transfer proportional to users, not events
+            per_user = session.query(Event.login_id, func.count(Event.id))\
+                .filter(Event.occurred_at >= bucket, Event.occurred_at < bucket_end)\
+                .group_by(Event.login_id)\
+                .all()
+            dimensions = self.load_dimensions(session, (login_id for login_id, _ in per_user))
+
+            cells: Dict[Tuple[str, str], List[Any]] = {}
+            for login_id, count in per_user:
+                key = dimensions.get(login_id, ('', ''))
+                cell = cells.setdefault(key, [0, []])
+                cell[0] += count
+                cell[1].append(login_id)
+
+            for (country, role), (event_count, login_ids) in cells.items():
+                sketch = HyperLogLog()
+                sketch.add_many(login_ids)
+                session.add(ActivityRollup(
+                    granularity=granularity,
+                    bucket_start=bucket,
+                    country=country,
+                    role=role,
+                    event_count=event_count,
+                    active_users=len(login_ids),
+                    user_sketch=sketch.to_bytes()
+                ))
+            cells_written += len(cells)
+            logger.info(f"Re-aggregated {granularity} bucket {bucket.isoformat()}: "
+                        f"{len(cells)} cells")
+
+        session.flush()
+        return cells_written
+
+    def reaggregate_range(self, session, start: datetime, end: datetime) -> int:
+        """Rebuild every rollup bucket at every granularity overlapping [start, end)"""
+        cells_written = 0
+        for granularity in GRANULARITIES:
+            cells_written += self.reaggregate_buckets(
+                session, granularity, iter_buckets(start, end, granularity)
+            )
+        return cells_written
+
+    def query_activity(self, session, start: datetime, end: datetime,
+                       granularity: Optional[str] = None,
+                       country: Optional[str] = None,
+                       role: Optional[str] = None,
+                       group_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return an activity series for [start, end) from the coarsest rollup
+        that covers the range, unless a granularity is requested explicitly
+        """
+        if granularity is None:
+            granularity = choose_granularity(start, end)
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if group_by not in (None, 'country', 'role'):
+            raise ValueError(f"Unsupported group_by: {group_by}")
+
+        columns = [ActivityRollup.bucket_start]
+        if group_by:
+            columns.append(getattr(ActivityRollup, group_by))
+        query = session.query(
+            *columns,
+            func.sum(ActivityRollup.event_count),
+            func.sum(ActivityRollup.active_users)
+        ).filter(
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.bucket_start >= truncate_to_bucket(start, granularity),
+            ActivityRollup.bucket_start < end
+        )
+        query = self._filter_dimensions(query, country, role)
+        query = query.group_by(*columns).order_by(*columns)
+
+        buckets = []
+        for row in query.all():
+            item = {'bucket': row[0].isoformat()}
+            if group_by:
+                item[group_by] = row[1]
+            item['events'] = int(row[-2] or 0)
+            item['active_users'] = int(row[-1] or 0)
+            buckets.append(item)
+
+        return {
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'buckets': buckets
+        }
+
+    def count_unique_users(self, session, start: datetime, end: datetime,
+                           country: Optional[str] = None,
+                           role: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Estimate distinct active users in [start, end) by merging the
+        HyperLogLog sketches of the coarsest cells covering the range
+        """
+        start = truncate_to_bucket(start, 'hour')
+        if truncate_to_bucket(end, 'hour') != end:
+            end = next_bucket(truncate_to_bucket(end, 'hour'), 'hour')
+
+        merged = HyperLogLog()
+        for granularity, buckets in decompose_range(start, end).items():
+            for batch in _chunked(buckets):
+                query = session.query(ActivityRollup.user_sketch)\
+                    .filter(ActivityRollup.granularity == granularity,
+                            ActivityRollup.bucket_start.in_(batch),
+                            ActivityRollup.user_sketch.isnot(None))
+                query = self._filter_dimensions(query, country, role)
+                for sketch, in query.all():
+                    merged.merge(HyperLogLog.from_bytes(sketch))
+
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'unique_users': merged.count(),
+            'relative_error': round(merged.relative_error, 4)
+        }
+
+    def active_user_summary(self, session, as_of: datetime,
+                            country: Optional[str] = None,
+                            role: Optional[str] = None) -> Dict[str, Any]:
+        """DAU/WAU/MAU estimates for the day, 7 days and 30 days ending at as_of"""
+        end = truncate_to_bucket(as_of, 'day')
+        summary = {'as_of': end.isoformat()}
+        for name, days in (('dau', 1), ('wau', 7), ('mau', 30)):
+            result = self.count_unique_users(session, end - timedelta(days=days), end,
+                                             country=country, role=role)
+            summary[name] = result['unique_users']
+            summary['relative_error'] = result['relative_error']
+        return summary
+
+    def _filter_dimensions(self, query, country: Optional[str], role: Optional[str]):
+        """
+        country matches exactly; role matches membership in the cell's role set,
+        the same meaning as the role dimension of the drill-down cube
+        """
+        if country is not None:
+            query = query.filter(ActivityRollup.country == country)
+        if role is not None:
+            query = query.filter(or_(
+                ActivityRollup.role == role,
+                ActivityRollup.role.like(f'{role},%'),
+                ActivityRollup.role.like(f'%,{role}'),
+                ActivityRollup.role.like(f'%,{role},%')
+            ))
+        return query
+
+    def _users_seen_before(self, session, granularity: str, bucket: datetime,
+                           login_ids: set, before_id: int) -> set:
+        """Users in login_ids with an earlier event in the same bucket"""
+        bucket_end = next_bucket(bucket, granularity)
+        seen = set()
+        for batch in _chunked(list(login_ids)):
+            rows = session.query(Event.login_id)\
+                .filter(Event.login_id.in_(batch),
+                        Event.occurred_at >= bucket,
+                        Event.occurred_at < bucket_end,
+                        Event.id < before_id)\
+                .distinct()\
+                .all()
+            seen.update(login_id for login_id, in rows)
+        return seen
+
+    def _load_cells(self, session, granularity: str,
+                    buckets: List[datetime]) -> Dict[Tuple[datetime, str, str], ActivityRollup]:
+        cells = {}
+        for batch in _chunked(buckets):
+            rows = session.query(ActivityRollup)\
+                .filter(ActivityRollup.granularity == granularity,
+                        ActivityRollup.bucket_start.in_(batch))\
+                .all()
+            for cell in rows:
+                cells[(cell.bucket_start, cell.country, cell.role)] = cell
+        return cells
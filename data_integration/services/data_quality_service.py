@@ -0,0 +1,235 @@
+'''
+Service producing columnar snapshots and data-quality metrics of the users table.
+Streams users into Arrow record batches (optionally written to Parquet) and
+computes the metrics with pyarrow compute instead of looping over ORM objects.
+'''
+
+"""
+Columnar user snapshots and data-quality reports
+"""
+from datetime import datetime
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, text
+from ..config.settings import SNAPSHOT_DIR, SNAPSHOT_BATCH_SIZE, SNAPSHOT_RETENTION
+from ..database.models import DataQualitySnapshot, DuplicateClusterMember
+from .identity_service import GENERATED_EMAIL_DOMAIN
+
+# pyarrow is imported on first use, so API workers that only serve the
+# history never pay for it; it is only required for snapshots and reports
+pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Where each user's email came from, mirroring DescopeService.extract_email
+SNAPSHOT_QUERY = text("""
+    SELECT id, project_id, login_id, email, country, user_roles, created_time, last_sync,
+        CASE
+            WHEN email IS NULL OR email = '' THEN 'missing'
+            WHEN lower(email) = lower(raw_data->>'email') THEN 'email'
+            WHEN email LIKE '%@' || :generated_domain THEN 'generated'
+            WHEN strpos(lower((raw_data->'loginIds')::text), '"' || lower(email) || '"') > 0 THEN 'login_id'
+            ELSE 'other'
+        END AS email_source
+    FROM users
+    ORDER BY id
+""")
+SNAPSHOT_FIELDS = [
+    ('id', 'int64'),
+    ('project_id', 'string'),
+    ('login_id', 'string'),
+    ('email', 'string'),
+    ('country', 'string'),
+    ('user_roles', 'string'),
+    ('created_time', 'timestamp'),
+    ('last_sync', 'timestamp'),
+    ('email_source', 'string'),
+]
+# Columns the metrics read back from a Parquet snapshot
+METRIC_COLUMNS = ['project_id', 'login_id', 'email', 'country', 'user_roles', 'created_time', 'email_source']
+
+
+def _require_pyarrow():
+    """Import pyarrow on first use"""
+    global pa, pc, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("pyarrow is required for data-quality snapshots")
+        pa, pc, pq = pyarrow, pyarrow.compute, pyarrow.parquet
+
+
+def snapshot_schema():
+    _require_pyarrow()
+    types = {'int64': pa.int64(), 'string': pa.string(), 'timestamp': pa.timestamp('us')}
+    return pa.schema([(name, types[kind]) for name, kind in SNAPSHOT_FIELDS])
+
+
+def _missing(column) -> Any:
+    """Boolean mask of null or empty values"""
+    if pa.types.is_string(column.type):
+        return pc.or_kleene(pc.is_null(column), pc.equal(column, ''))
+    return pc.is_null(column)
+
+
+def _value_counts(column) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct values and their counts, most frequent first"""
+    counts = pc.value_counts(column)
+    values = np.array(counts.field('values').to_pylist(), dtype=object)
+    frequencies = counts.field('counts').to_numpy()
+    order = np.argsort(-frequencies, kind='stable')
+    return values[order], frequencies[order]
+
+
+def _duplicates(column) -> Dict[str, int]:
+    """Number of values shared by several rows and of rows involved"""
+    frequencies = pc.value_counts(column).field('counts').to_numpy()
+    shared = frequencies[frequencies > 1]
+    return {'groups': int(shared.size), 'users': int(shared.sum())}
+
+
+def compute_quality_metrics(table) -> Dict[str, Any]:
+    """Data-quality metrics of a users snapshot, computed column-wise"""
+    _require_pyarrow()
+    total = table.num_rows
+    null_rates = {}
+    for name in ('email', 'country', 'user_roles', 'created_time'):
+        missing = pc.sum(_missing(table[name])).as_py() or 0
+        null_rates[name] = round(missing / total, 4) if total else 0.0
+
+    country = pc.if_else(_missing(table['country']), 'unknown', table['country'])
+    countries, country_counts = _value_counts(country)
+    sources, source_counts = _value_counts(table['email_source'])
+    projects, project_counts = _value_counts(table['project_id'])
+
+    emails = table['email'].filter(pc.invert(_missing(table['email'])))
+    return {
+        'total_users': total,
+        'null_rates': null_rates,
+        'email_sources': dict(zip(sources.tolist(), source_counts.tolist())),
+        'country_histogram': dict(zip(countries.tolist(), country_counts.tolist())),
+        'users_per_project': dict(zip(projects.tolist(), project_counts.tolist())),
+        'duplicates': {
+            'email': _duplicates(pc.utf8_lower(emails)),
+            # Same Descope user ID in several projects
+            'login_id': _duplicates(table['login_id'])
+        }
+    }
+
+
+class DataQualityService:
+    """Snapshots the users table and keeps a history of its data quality"""
+
+    def __init__(self, snapshot_dir: Optional[str] = SNAPSHOT_DIR,
+                 batch_size: int = SNAPSHOT_BATCH_SIZE, retention: int = SNAPSHOT_RETENTION):
+        _require_pyarrow()
+        self.snapshot_dir = snapshot_dir
+        self.batch_size = batch_size
+        self.retention = retention
+
+    def iter_batches(self, session):
+        """Stream the users table as Arrow record batches"""
+        schema = snapshot_schema()
+        result = session.connection()\
+            .execution_options(stream_results=True)\
+            .execute(SNAPSHOT_QUERY, {'generated_domain': GENERATED_EMAIL_DOMAIN})
+        for rows in result.partitions(self.batch_size):
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+
+    def export_snapshot(self, session, path: Optional[str] = None) -> Tuple[Any, Optional[str]]:
+        """
+        Write a Parquet snapshot batch by batch when a path or snapshot directory
+        is set, then read back only the metric columns. Returns (table, path).
+        """
+        if path is None and self.snapshot_dir:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            path = os.path.join(self.snapshot_dir, f"users-{datetime.utcnow():%Y%m%dT%H%M%S%f}.parquet")
+            managed = True
+        else:
+            managed = False
+        if not path:
+            batches = list(self.iter_batches(session))
+            return pa.Table.from_batches(batches, schema=snapshot_schema()), None
+
+        with pq.ParquetWriter(path, snapshot_schema(), compression='zstd') as writer:
+            for batch in self.iter_batches(session):
+                writer.write_batch(batch)
+        logger.info(f"Wrote users snapshot to {path}")
+        table = pq.read_table(path, columns=METRIC_COLUMNS, memory_map=True)
+        if managed:
+            self.prune_snapshots(session)
+        return table, path
+
+    def prune_snapshots(self, session) -> List[str]:
+        """Delete all but the newest `retention` files in the snapshot directory"""
+        files = sorted(
+            name for name in os.listdir(self.snapshot_dir)
+            if name.startswith('users-') and name.endswith('.parquet')
+        )
+        expired = [os.path.join(self.snapshot_dir, name)
+                   for name in files[:max(0, len(files) - self.retention)]]
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not delete snapshot {path}: {e}")
+        if expired:
+            # The metrics stay in the history; only the file is gone
+            session.query(DataQualitySnapshot)\
+                .filter(DataQualitySnapshot.snapshot_path.in_(expired))\
+                .update({'snapshot_path': None}, synchronize_session=False)
+            logger.info(f"Deleted {len(expired)} old snapshots")
+        return expired
+
+    def report(self, session, path: Optional[str] = None) -> Dict[str, Any]:
+        """Compute the metrics without recording them"""
+        table, path = self.export_snapshot(session, path)
+        metrics = compute_quality_metrics(table)
+        clusters, clustered_users = session.query(
+            func.count(func.distinct(DuplicateClusterMember.cluster_id)),
+            func.count(DuplicateClusterMember.user_id)
+        ).one()
+        metrics['duplicates']['identity'] = {'groups': clusters, 'users': clustered_users}
+        return dict(metrics, snapshot_path=path)
+
+    def record_snapshot(self, session, sync_result: Optional[Dict[str, Any]] = None,
+                        path: Optional[str] = None) -> Dict[str, Any]:
+        """Compute the metrics and append them to the history; the caller commits"""
+        metrics = self.report(session, path)
+        path = metrics.pop('snapshot_path')
+        snapshot = DataQualitySnapshot(
+            created_at=datetime.utcnow(),
+            total_users=metrics['total_users'],
+            email_null_rate=metrics['null_rates']['email'],
+            country_null_rate=metrics['null_rates']['country'],
+            roles_null_rate=metrics['null_rates']['user_roles'],
+            duplicate_email_users=metrics['duplicates']['email']['users'],
+            metrics=metrics,
+            sync_result=sync_result,
+            snapshot_path=path
+        )
+        session.add(snapshot)
+        session.flush()
+        logger.info(f"Recorded data-quality snapshot {snapshot.id}: {metrics['total_users']} users, "
+                    f"email null rate {snapshot.email_null_rate:.2%}")
+        return snapshot.to_dict()
+
+    @staticmethod
+    def history(session, limit: int = 30) -> List[Dict[str, Any]]:
+        """Latest snapshots, oldest first for charting"""
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        snapshots = session.query(DataQualitySnapshot)\
+            .order_by(DataQualitySnapshot.created_at.desc())\
+            .limit(limit)\
+            .all()
+        return [snapshot.to_dict() for snapshot in reversed(snapshots)]
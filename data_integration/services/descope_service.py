@@ -9,27 +9,96 @@ Service for handling Descope integration and data synchronization
 from descope import DescopeClient
 from datetime import datetime
 import logging
-import time
 import re
 import json
 import unicodedata
 from typing import Dict, Any, List, Optional, Union
-from ..config.settings import DESCOPE_PROJECT_ID, DESCOPE_MANAGEMENT_KEY
-from ..database.models import User
+from ..config.settings import DESCOPE_PROJECTS
+from ..database.models import User, SyncRun
 from ..database.database import get_db_session
+from ..utils.cache_manager import refresh_user_cube, cube_summary
+from .stream_service import publish, users_delta
+from ..utils.http_cache import bump_generation
+from ..utils.performance import NullProfiler, RateLimiter
 
 logger = logging.getLogger(__name__)
 
+def parse_created_time(value: Any) -> Optional[datetime]:
+    """
+    Convert Descope's createdTime (Unix seconds) to a naive UTC datetime.
+    Millisecond values, as some exports contain, are detected by magnitude.
+    """
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        return None
+    if timestamp > 1e11:
+        timestamp /= 1000
+    try:
+        return datetime.utcfromtimestamp(timestamp)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+def refresh_user_aggregates(result: Dict[str, Any], profiler=None):
+    """
+    Rebuild the cube and duplicate clusters once a sync has written its users,
+    record a data-quality snapshot and store the run in sync_runs
+    """
+    from .identity_service import IdentityResolutionService
+    profiler = profiler or NullProfiler()
+    try:
+        with profiler.stage('refresh'), get_db_session() as session:
+            refresh_user_cube(session)
+            IdentityResolutionService().resolve(session)
+            publish(session, 'aggregates', cube_summary(session))
+            bump_generation(session, 'users')
+            # Profiles and per-project results would push the message past MAX_PAYLOAD_BYTES
+            summary = {k: v for k, v in result.items() if k not in ('profile', 'projects')}
+            publish(session, 'sync', dict(summary, status='completed'))
+    except Exception as e:
+        logger.error(f"Error refreshing user aggregates: {e}")
+    try:
+        from .data_quality_service import DataQualityService
+        with profiler.stage('data_quality'), get_db_session() as session:
+            DataQualityService().record_snapshot(session, result)
+            bump_generation(session, 'users')
+    except Exception as e:
+        logger.error(f"Error recording data-quality snapshot: {e}")
+    if profiler.enabled:
+        result['profile'] = profiler.summary()
+    try:
+        with get_db_session() as session:
+            session.add(SyncRun(
+                total_processed=result['total_processed'],
+                synced=result['synced'],
+                errors=result['errors'],
+                result=result,
+                profile=result.get('profile')
+            ))
+    except Exception as e:
+        logger.error(f"Error recording sync run: {e}")
+
 class DescopeService:
-    def __init__(self):
-        self.client = DescopeClient(
-            project_id=DESCOPE_PROJECT_ID,
-            management_key=DESCOPE_MANAGEMENT_KEY
+    def __init__(self, project: Optional[Dict[str, Any]] = None, offline: bool = False,
+                 profiler=None):
+        """
+        project is one entry of DESCOPE_PROJECTS (the first one by default).
+        Offline instances only normalize data, e.g. when backfilling from an export.
+        A started SyncProfiler records per-stage timings of sync_users_to_db.
+        """
+        self.profiler = profiler or NullProfiler()
+        self.project = project or DESCOPE_PROJECTS[0]
+        self.project_id = self.project['project_id']
+        self.rate_limiter = RateLimiter(self.project['rate_limit'])
+        self.client = None if offline else DescopeClient(
+            project_id=self.project_id,
+            management_key=self.project['management_key']
         )
 
     def fetch_all_users_batched(self):
         """
-        Fetch all users using multiple search_all calls with small delays
+        Fetch all users using multiple search_all calls, spaced out by the
+        project's rate limit
         """
         all_users = set()  # Use a set to store unique user IDs
         user_data = {}     # Store full user data by ID
@@ -38,8 +107,11 @@ class DescopeService:
         
         while attempt < max_attempts:
             try:
-                logger.info(f"Fetching batch attempt {attempt + 1}/{max_attempts}")
-                response = self.client.mgmt.user.search_all()
+                logger.info(f"[{self.project_id}] Fetching batch attempt {attempt + 1}/{max_attempts}")
+                with self.profiler.stage('rate_limit_wait'):
+                    self.rate_limiter.wait()
+                with self.profiler.stage('search_all'):
+                    response = self.client.mgmt.user.search_all()
                 if not isinstance(response, dict) or 'users' not in response:
                     logger.error("Unexpected response format")
                     break
@@ -63,14 +135,12 @@ class DescopeService:
                 if new_users == 0 and attempt > 0:
                     break
                 
-                # Add a delay between attempts
-                time.sleep(5)
                 attempt += 1
             except Exception as e:
                 logger.error(f"Error in batch {attempt + 1}: {e}")
                 break
         
-        logger.info(f"Total unique users fetched: {len(all_users)}")
+        logger.info(f"[{self.project_id}] Total unique users fetched: {len(all_users)}")
         return list(user_data.values())
 
     def is_valid_email(self, email: str) -> bool:
@@ -297,41 +367,74 @@ class DescopeService:
             logger.error(f"Error extracting email: {e}")
             return ""
 
-    def sync_users_to_db(self):
-        """Synchronize Descope users to local database"""
-        users = self.fetch_all_users_batched()
+    def normalize_user(self, user_data: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Map one Descope user record to User column values"""
+        # Handle string input
+        if isinstance(user_data, str):
+            return {
+                'project_id': self.project_id,
+                'login_id': user_data,
+                'email': self.extract_email(user_data),
+                'created_time': None,
+                'country': "",
+                'user_roles': "",
+                'raw_data': {"userId": user_data}
+            }
+        custom_attrs = user_data.get('customAttributes', {})
+        country = custom_attrs.get('country', '') if isinstance(custom_attrs, dict) else ''
+        roles = custom_attrs.get('userRoles', '') if isinstance(custom_attrs, dict) else ''
+        roles_str = roles if isinstance(roles, str) else ', '.join(roles) if isinstance(roles, list) else ''
+        with self.profiler.stage('extract_email'):
+            email = self.extract_email(user_data)
+        return {
+            'project_id': self.project_id,
+            'login_id': user_data.get('userId', ''),
+            'email': email,
+            'created_time': parse_created_time(user_data.get('createdTime')),
+            'country': country,
+            'user_roles': roles_str,
+            'raw_data': user_data
+        }
+
+    def sync_users_to_db(self, refresh_aggregates: bool = True):
+        """
+        Synchronize this project's Descope users to the local database.
+        Multi-project syncs pass refresh_aggregates=False and refresh once at the end.
+        With a profiler, the result also carries a 'profile' stage breakdown.
+        """
+        profiler = self.profiler
+        with profiler.stage('fetch'):
+            users = self.fetch_all_users_batched()
         synced_count = 0
         error_count = 0
         emails_from_login = 0
+        # Changes since the last commit, published as one delta per committed chunk
+        chunk = {'added': 0, 'updated': 0, 'login_ids': []}
         
         with get_db_session() as session:
             for user_data in users:
                 try:
-                    # Handle string input
-                    if isinstance(user_data, str):
-                        login_id = user_data
-                        email = self.extract_email(user_data)
-                        country = ""
-                        roles_str = ""
-                        raw_data = {"userId": user_data}
-                    else:
-                        login_id = user_data.get('userId', '')
-                        email = self.extract_email(user_data)
-                        custom_attrs = user_data.get('customAttributes', {})
-                        country = custom_attrs.get('country', '') if isinstance(custom_attrs, dict) else ''
-                        roles = custom_attrs.get('userRoles', '') if isinstance(custom_attrs, dict) else ''
-                        roles_str = roles if isinstance(roles, str) else ', '.join(roles) if isinstance(roles, list) else ''
-                        raw_data = user_data
+                    with profiler.stage('normalize'):
+                        normalized = self.normalize_user(user_data)
+                    login_id = normalized['login_id']
+                    email = normalized['email']
+                    country = normalized['country']
+                    roles_str = normalized['user_roles']
+                    raw_data = normalized['raw_data']
 
                     if not user_data.get('email') and '@' in email:
                         emails_from_login += 1
                     
-                    existing_user = session.query(User).filter_by(
-                        login_id=login_id
-                    ).first()
+                    # Includes the autoflush of the previous user's changes
+                    with profiler.stage('lookup'):
+                        existing_user = session.query(User).filter_by(
+                            project_id=self.project_id,
+                            login_id=login_id
+                        ).first()
                     
                     if existing_user:
                         existing_user.email = email
+                        existing_user.created_time = normalized['created_time']
                         existing_user.country = country
                         existing_user.user_roles = roles_str
                         existing_user.last_sync = datetime.utcnow()
@@ -339,8 +442,10 @@ class DescopeService:
                         action = "Updated"
                     else:
                         new_user = User(
+                            project_id=self.project_id,
                             login_id=login_id,
                             email=email,
+                            created_time=normalized['created_time'],
                             country=country,
                             user_roles=roles_str,
                             raw_data=raw_data,
@@ -349,8 +454,17 @@ class DescopeService:
                         session.add(new_user)
                         action = "Added"
                     
+                    chunk['added' if action == "Added" else 'updated'] += 1
+                    chunk['login_ids'].append(login_id)
+                    
                     if synced_count % 1000 == 0:
-                        session.commit()
+                        with profiler.stage('commit'):
+                            publish(session, 'users', users_delta(
+                                chunk['added'], chunk['updated'], synced_count + 1, len(users), chunk['login_ids']
+                            ))
+                            bump_generation(session, 'users')
+                            session.commit()
+                        chunk = {'added': 0, 'updated': 0, 'login_ids': []}
                         logger.info(f"Progress: {synced_count} users processed. "
                                   f"Found {emails_from_login} emails in login IDs.")
                     
@@ -359,18 +473,33 @@ class DescopeService:
                     error_count += 1
                     logger.error(f"Error syncing user {user_data.get('userId', 'unknown')}: {e}")
                     session.rollback()
+                    chunk = {'added': 0, 'updated': 0, 'login_ids': []}
                     continue
             
             try:
-                session.commit()
+                with profiler.stage('commit'):
+                    if chunk['login_ids']:
+                        publish(session, 'users', users_delta(
+                            chunk['added'], chunk['updated'], synced_count, len(users), chunk['login_ids']
+                        ))
+                        bump_generation(session, 'users')
+                    session.commit()
             except Exception as e:
                 logger.error(f"Error committing final transaction: {e}")
                 session.rollback()
                 error_count += 1
         
-        return {
+        result = {
+            'project_id': self.project_id,
             'total_processed': len(users),
             'synced': synced_count,
             'errors': error_count,
             'emails_from_login': emails_from_login
-        }
\ No newline at end of file
+        }
+        if profiler.enabled:
+            result['profile'] = profiler.summary()
+        
+        if refresh_aggregates:
+            refresh_user_aggregates(result, profiler)
+        
+        return result
\ No newline at end of file
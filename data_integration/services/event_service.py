@@ -0,0 +1,275 @@
+'''
+Service handling high-throughput event ingestion.
+Validates incoming event batches, buffers them in memory and flushes them
+to the partitioned events table and activity rollups in the background.
+'''
+
+"""
+Buffered event ingestion
+"""
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text
+from ..config.settings import (
+    EVENT_BUFFER_CAPACITY, EVENT_FLUSH_SIZE, EVENT_FLUSH_INTERVAL,
+    EVENT_MAX_AGE_DAYS, EVENT_MAX_FUTURE_SECONDS
+)
+from ..database.database import get_db_session
+from ..database.models import Event
+from .activity_service import ActivityRollupService, truncate_to_bucket, next_bucket
+from .stream_service import publish
+from ..utils.http_cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGIN_ID_LENGTH = 256
+MAX_EVENT_TYPE_LENGTH = 128
+MAX_FLUSH_RETRIES = 3
+# Serializes chunk writes across processes so rollups see chunks in id order
+EVENT_WRITER_LOCK_ID = 72610029
+
+# Lightweight stand-in for Event rows returned by a multi-row INSERT ... RETURNING
+InsertedEvent = namedtuple('InsertedEvent', ['id', 'login_id', 'occurred_at'])
+
+
+def parse_occurred_at(value: Any) -> datetime:
+    """Parse an ISO-8601 string or epoch milliseconds into a naive UTC datetime"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.utcfromtimestamp(value / 1000)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError("occurred_at is out of range")
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = datetime.utcfromtimestamp(parsed.timestamp())
+        return parsed
+    raise ValueError("occurred_at must be an ISO-8601 string or epoch milliseconds")
+
+
+def check_occurred_at(occurred_at: datetime, now: Optional[datetime] = None) -> datetime:
+    """Reject timestamps outside the accepted window"""
+    now = now or datetime.utcnow()
+    if occurred_at < now - timedelta(days=EVENT_MAX_AGE_DAYS):
+        raise ValueError(f"occurred_at must be within the last {EVENT_MAX_AGE_DAYS} days")
+    if occurred_at > now + timedelta(seconds=EVENT_MAX_FUTURE_SECONDS):
+        raise ValueError(f"occurred_at must be at most {EVENT_MAX_FUTURE_SECONDS} seconds in the future")
+    return occurred_at
+
+
+def validate_event(raw: Any) -> Dict[str, Any]:
+    """
+    Cheap structural validation of one incoming event.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("event must be a JSON object")
+    login_id = raw.get('login_id')
+    if not isinstance(login_id, str) or not login_id or len(login_id) > MAX_LOGIN_ID_LENGTH:
+        raise ValueError("login_id must be a non-empty string")
+    event_type = raw.get('event_type')
+    if not isinstance(event_type, str) or not event_type or len(event_type) > MAX_EVENT_TYPE_LENGTH:
+        raise ValueError("event_type must be a non-empty string")
+    properties = raw.get('properties')
+    if properties is not None and not isinstance(properties, dict):
+        raise ValueError("properties must be a JSON object")
+    occurred_at = raw.get('occurred_at')
+    return {
+        'login_id': login_id,
+        'event_type': event_type,
+        'occurred_at': check_occurred_at(parse_occurred_at(occurred_at)) if occurred_at is not None else datetime.utcnow(),
+        'properties': properties
+    }
+
+
+def validate_events(raw_events: List[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split a batch into valid events and per-index errors"""
+    valid, errors = [], []
+    for index, raw in enumerate(raw_events):
+        try:
+            valid.append(validate_event(raw))
+        # utcfromtimestamp raises OSError for epochs the platform cannot represent
+        except (ValueError, TypeError, OverflowError, OSError) as e:
+            errors.append({'index': index, 'error': str(e)})
+    return valid, errors
+
+
+class EventWriter:
+    """Writes event chunks to the database and folds them into the rollups"""
+
+    def __init__(self):
+        self.rollups = ActivityRollupService()
+        # Partitions known to exist, and those created by the current chunk's
+        # transaction, which only become known once it commits
+        self._partitions = set()
+        self._pending_partitions = set()
+
+    def ensure_partitions(self, session, events: List[Dict[str, Any]]):
+        """Create the monthly partitions needed by a chunk, once per process"""
+        if session.bind.dialect.name != 'postgresql':
+            return
+        if 'default' not in self._partitions:
+            session.execute(text("CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT"))
+            self._pending_partitions.add('default')
+        for month in {truncate_to_bucket(e['occurred_at'], 'month') for e in events}:
+            name = f"events_{month:%Y_%m}"
+            if name in self._partitions:
+                continue
+            session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF events "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_bucket(month, 'month'):%Y-%m-%d}')"
+            ))
+            self._pending_partitions.add(name)
+
+    def mark_committed(self):
+        """Remember the partitions of the last chunk once its transaction has committed"""
+        self._partitions |= self._pending_partitions
+        self._pending_partitions = set()
+
+    def write_chunk(self, session, events: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Insert a chunk with one multi-row INSERT and update the rollups"""
+        if not events:
+            return {'events': 0, 'cells': 0}
+        if session.bind.dialect.name != 'postgresql':
+            return self.rollups.record_events(session, events)
+
+        session.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {'lock_id': EVENT_WRITER_LOCK_ID})
+        # A rolled back chunk's partitions were never created
+        self._pending_partitions = set()
+        self.ensure_partitions(session, events)
+        table = Event.__table__
+        result = session.execute(
+            table.insert()
+            .values(events)
+            .returning(table.c.id, table.c.login_id, table.c.occurred_at)
+        )
+        inserted = [InsertedEvent(*row) for row in result]
+        summary = self.rollups.apply_event_chunk(session, inserted)
+        publish(session, 'activity', {'events': len(inserted)})
+        bump_generation(session, 'events')
+        return summary
+
+
+class EventBuffer:
+    """
+    Bounded in-process buffer drained by a single background writer thread.
+
+    A flush is triggered when flush_size events are pending or flush_interval
+    seconds have passed. offer() rejects a whole batch when it would push the
+    pending count past capacity, which the API surfaces as HTTP 429.
+    """
+
+    def __init__(self, capacity: int = EVENT_BUFFER_CAPACITY,
+                 flush_size: int = EVENT_FLUSH_SIZE,
+                 flush_interval: float = EVENT_FLUSH_INTERVAL,
+                 writer: Optional[EventWriter] = None):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.writer = writer or EventWriter()
+        self._events = deque()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._stats = {'accepted': 0, 'rejected': 0, 'flushed': 0, 'dropped': 0, 'flushes': 0}
+        self._last_flush_at = None
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flush pending events and stop the writer thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def offer(self, events: List[Dict[str, Any]]) -> bool:
+        """Append a batch if there is room for all of it"""
+        with self._condition:
+            if len(self._events) + self._in_flight + len(events) > self.capacity:
+                self._stats['rejected'] += len(events)
+                return False
+            self._events.extend(events)
+            self._stats['accepted'] += len(events)
+            if len(self._events) >= self.flush_size:
+                self._condition.notify()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return dict(
+                self._stats,
+                pending=len(self._events) + self._in_flight,
+                capacity=self.capacity,
+                last_flush_at=self._last_flush_at.isoformat() if self._last_flush_at else None
+            )
+
+    def _take_chunk(self) -> List[Dict[str, Any]]:
+        chunk = []
+        while self._events and len(chunk) < self.flush_size:
+            chunk.append(self._events.popleft())
+        self._in_flight = len(chunk)
+        return chunk
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopping or len(self._events) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+                chunk = self._take_chunk()
+                if not chunk and self._stopping:
+                    return
+            if chunk:
+                self._flush(chunk)
+
+    def _flush(self, chunk: List[Dict[str, Any]]):
+        for attempt in range(1, MAX_FLUSH_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                with get_db_session() as session:
+                    self.writer.write_chunk(session, chunk)
+                self.writer.mark_committed()
+                elapsed = time.perf_counter() - started
+                logger.debug(f"Flushed {len(chunk)} events in {elapsed * 1000:.1f}ms")
+                with self._condition:
+                    self._stats['flushed'] += len(chunk)
+                    self._stats['flushes'] += 1
+                    self._last_flush_at = datetime.utcnow()
+                    self._in_flight = 0
+                return
+            except Exception as e:
+                logger.error(f"Error flushing {len(chunk)} events (attempt {attempt}/{MAX_FLUSH_RETRIES}): {e}")
+                time.sleep(self.flush_interval * attempt)
+
+        logger.error(f"Dropping {len(chunk)} events after {MAX_FLUSH_RETRIES} failed flushes")
+        with self._condition:
+            self._stats['dropped'] += len(chunk)
+            self._in_flight = 0
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer() -> EventBuffer:
+    """Return the process-wide event buffer, starting its writer on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = EventBuffer()
+            _buffer.start()
+            atexit.register(_buffer.stop, EVENT_FLUSH_INTERVAL * 5)
+        return _buffer
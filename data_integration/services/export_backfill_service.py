@@ -0,0 +1,225 @@
+'''
+Service backfilling users from an exported Descope user dump on disk.
+Streams JSON or NDJSON exports through a memory-mapped file so multi-GB
+dumps load in constant memory, bypassing the rate-limited Descope API.
+'''
+
+"""
+Streaming backfill from Descope user exports
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import mmap
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from ..config.settings import DESCOPE_PROJECTS
+from ..database.database import get_db_session, bulk_upsert_users
+from ..utils.http_cache import bump_generation
+from .descope_service import DescopeService, refresh_user_aggregates
+from .stream_service import publish, users_delta
+
+try:
+    import ijson
+except ImportError:  # Only required for JSON (non-NDJSON) exports
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 5000
+FORMATS = ('auto', 'ndjson', 'json')
+# Bytes inspected when guessing the export format
+DETECT_WINDOW = 1 << 20
+
+
+def detect_format(mm: mmap.mmap) -> str:
+    """Guess between a JSON document and NDJSON from a bounded prefix"""
+    start = 0
+    while start < len(mm) and mm[start:start + 1].isspace():
+        start += 1
+    if mm[start:start + 1] == b'[':
+        return 'json'
+    end = mm.find(b'\n', start, start + DETECT_WINDOW)
+    if end == -1:
+        # No line break early on: a single-line JSON document, or a one-record file
+        end = min(len(mm), start + DETECT_WINDOW)
+        if end < len(mm):
+            return 'json'
+    try:
+        record = json.loads(mm[start:end])
+    except ValueError:
+        # The first line of a pretty-printed document is not valid JSON on its own
+        return 'json'
+    if isinstance(record, dict) and isinstance(record.get('users'), list):
+        return 'json'
+    return 'ndjson'
+
+
+def iter_ndjson(mm: mmap.mmap) -> Iterator[bytes]:
+    """Stream raw lines; they are decoded by the normalization workers"""
+    position = 0
+    size = len(mm)
+    while position < size:
+        end = mm.find(b'\n', position)
+        if end == -1:
+            end = size
+        line = mm[position:end].strip()
+        position = end + 1
+        # Keep the file position in step so parsed pages can be released
+        mm.seek(min(position, size))
+        if line:
+            yield line
+
+
+def iter_json(mm: mmap.mmap) -> Iterator[Dict[str, Any]]:
+    """Stream users from a top-level array or a {"users": [...]} document"""
+    if ijson is None:
+        raise RuntimeError("ijson is required to stream JSON exports; use NDJSON or install ijson")
+    start = 0
+    while start < len(mm) and mm[start:start + 1].isspace():
+        start += 1
+    prefix = 'item' if mm[start:start + 1] == b'[' else 'users.item'
+    mm.seek(0)
+    yield from ijson.items(mm, prefix, use_float=True)
+
+
+_worker_services: Dict[str, DescopeService] = {}
+
+
+def normalize_batch(records: List[Any], project: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[str], int]:
+    """
+    Decode and normalize a batch of export records for one project.
+    Runs in worker processes; returns (rows, errors, emails_from_login).
+    """
+    service = _worker_services.get(project['project_id'])
+    if service is None:
+        service = _worker_services[project['project_id']] = DescopeService(project, offline=True)
+    rows, errors, emails_from_login = [], [], 0
+    for record in records:
+        try:
+            if isinstance(record, bytes):
+                record = json.loads(record)
+            normalized = service.normalize_user(record)
+            if not normalized['login_id']:
+                raise ValueError("record has no userId")
+            if isinstance(record, dict) and not record.get('email') and '@' in normalized['email']:
+                emails_from_login += 1
+            rows.append(normalized)
+        except Exception as e:
+            errors.append(str(e))
+    return rows, errors, emails_from_login
+
+
+def _iter_batches(records: Iterator[Any], batch_size: int, limit: Optional[int]) -> Iterator[List[Any]]:
+    batch, count = [], 0
+    for record in records:
+        if limit is not None and count >= limit:
+            break
+        batch.append(record)
+        count += 1
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ExportBackfillService:
+    """Loads a Descope export through the same normalization as the live sync"""
+
+    def __init__(self, batch_size: int = BACKFILL_BATCH_SIZE, workers: Optional[int] = None,
+                 project_id: Optional[str] = None):
+        self.batch_size = batch_size
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # Exports are per project; only the project ID is needed offline
+        self.project = next(
+            (p for p in DESCOPE_PROJECTS if p['project_id'] == project_id),
+            DESCOPE_PROJECTS[0] if project_id is None else
+            {'project_id': project_id, 'management_key': None, 'rate_limit': 0}
+        )
+
+    def backfill(self, path: str, file_format: str = 'auto',
+                 limit: Optional[int] = None) -> Dict[str, Any]:
+        if file_format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        started = time.perf_counter()
+        totals = {'project_id': self.project['project_id'], 'total_processed': 0,
+                  'inserted': 0, 'updated': 0, 'errors': 0, 'emails_from_login': 0}
+
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if file_format == 'auto':
+                file_format = detect_format(mm)
+            logger.info(f"Backfilling {path} into project {self.project['project_id']} "
+                        f"({len(mm) / 1e6:.1f} MB, {file_format})")
+            records = iter_ndjson(mm) if file_format == 'ndjson' else iter_json(mm)
+
+            batches = _iter_batches(records, self.batch_size, limit)
+            for rows, errors, emails_from_login in self._normalize(batches):
+                totals['total_processed'] += len(rows) + len(errors)
+                totals['errors'] += len(errors)
+                totals['emails_from_login'] += emails_from_login
+                for error in errors[:5]:
+                    logger.error(f"Skipping record: {error}")
+                self._write_batch(rows, totals, self._estimate_total(mm, totals, limit))
+                self._release_pages(mm)
+            size = len(mm)
+
+        elapsed = time.perf_counter() - started
+        totals['synced'] = totals['inserted'] + totals['updated']
+        totals['seconds'] = round(elapsed, 2)
+        totals['mb_per_second'] = round(size / 1e6 / elapsed, 1) if elapsed else None
+        # Same follow-up as a live sync, ending with the 'sync' completion event
+        refresh_user_aggregates(totals)
+        logger.info(f"Backfill completed: {totals}")
+        return totals
+
+    @staticmethod
+    def _estimate_total(mm: mmap.mmap, totals: Dict[str, Any], limit: Optional[int]) -> int:
+        """Extrapolate the number of records from the share of the file read so far"""
+        processed = totals['total_processed']
+        estimate = round(processed * len(mm) / mm.tell()) if mm.tell() else processed
+        if limit is not None:
+            estimate = min(estimate, limit)
+        return max(estimate, processed)
+
+    def _normalize(self, batches: Iterator[List[Any]]) -> Iterator[Tuple[List[Dict[str, Any]], List[str], int]]:
+        """
+        Normalize batches in order, in parallel when workers > 1. At most two
+        batches per worker are in flight, so memory stays bounded.
+        """
+        if self.workers <= 1:
+            for batch in batches:
+                yield normalize_batch(batch, self.project)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append(executor.submit(normalize_batch, batch, self.project))
+                if len(in_flight) >= self.workers * 2:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _write_batch(self, batch, totals, total):
+        if not batch:
+            return
+        with get_db_session() as session:
+            inserted, updated = bulk_upsert_users(session, batch)
+            publish(session, 'users', users_delta(
+                inserted, updated, totals['total_processed'], total, [row['login_id'] for row in batch]
+            ))
+            bump_generation(session, 'users')
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        logger.info(f"Progress: {totals['total_processed']} records, "
+                    f"{totals['inserted']} inserted, {totals['updated']} updated")
+
+    def _release_pages(self, mm: mmap.mmap):
+        """Drop already-parsed pages so resident memory stays flat on huge files"""
+        if not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        consumed = mm.tell() - mm.tell() % mmap.PAGESIZE
+        if consumed > 0:
+            mm.madvise(mmap.MADV_DONTNEED, 0, consumed)
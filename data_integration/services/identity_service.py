@@ -0,0 +1,238 @@
+'''
+Service resolving duplicate user identities across login IDs.
+Derives blocking keys (normalized email, normalized name, social login ID)
+into an indexed side table and clusters users sharing any key.
+'''
+
+"""
+Identity resolution over blocking keys
+"""
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import func
+from ..database.models import User, IdentityKey, DuplicateClusterMember
+
+logger = logging.getLogger(__name__)
+
+KEY_TYPES = ('email', 'name', 'social')
+# Domain of the placeholder addresses generate_email_from_name produces;
+# they carry no more evidence than the name key
+GENERATED_EMAIL_DOMAIN = 'example.com'
+# Keys shared by more users than this (e.g. "test.user") are too common to
+# link identities and would collapse unrelated users into one cluster
+MAX_BLOCK_SIZE = 500
+WRITE_CHUNK_SIZE = 5000
+
+
+def normalize_email_key(email: Optional[str]) -> Optional[str]:
+    """Lowercase and drop +tags, so 'Jane+news@X.com' matches 'jane@x.com'"""
+    if not isinstance(email, str) or '@' not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition('@')
+    local = local.split('+', 1)[0]
+    if not local or not domain or domain == GENERATED_EMAIL_DOMAIN:
+        return None
+    return f"{local}@{domain}"
+
+
+class UnionFind:
+    """Disjoint sets with path halving and union by size"""
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+        self.size: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        if item not in parent:
+            parent[item] = item
+            self.size[item] = 1
+            return item
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> int:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+
+class IdentityResolutionService:
+    """Maintains identity keys and pre-computed duplicate clusters"""
+
+    def __init__(self):
+        self._descope = None
+
+    @property
+    def descope(self):
+        """
+        The sync's name and social login normalization, created on first use so
+        the API, which only pages through clusters, never loads the Descope SDK
+        """
+        if self._descope is None:
+            from .descope_service import DescopeService
+            self._descope = DescopeService(offline=True)
+        return self._descope
+
+    def blocking_keys(self, login_id: str, email: Optional[str],
+                      raw_data: Any) -> List[Tuple[str, str]]:
+        """Derive the (key_type, key_value) pairs for one user"""
+        keys = set()
+        email_key = normalize_email_key(email)
+        if email_key:
+            keys.add(('email', email_key))
+        if not isinstance(raw_data, dict):
+            raw_data = {}
+
+        name = raw_data.get('name')
+        if isinstance(name, dict):
+            name = name.get('displayName') or \
+                f"{name.get('firstName', '')} {name.get('lastName', '')}".strip()
+        if isinstance(name, str) and name.strip():
+            name_key = self.descope.normalize_name(name)
+            # A single token ("admin", "john") is too weak to link identities
+            if '.' in name_key:
+                keys.add(('name', name_key))
+
+        login_ids = raw_data.get('loginIds')
+        candidates = [login_id] + (login_ids if isinstance(login_ids, list) else [])
+        for candidate in candidates:
+            if self.descope.extract_social_id(candidate):
+                keys.add(('social', candidate.strip().lower()))
+            else:
+                # Login IDs are often the email address itself
+                email_key = normalize_email_key(candidate)
+                if email_key and self.descope.is_valid_email(email_key):
+                    keys.add(('email', email_key))
+        return sorted(keys)
+
+    def refresh_keys(self, session) -> int:
+        """Rebuild the identity_keys table from the current users"""
+        session.query(IdentityKey).delete(synchronize_session=False)
+        total = 0
+        for chunk in self._iter_key_rows(session):
+            session.execute(IdentityKey.__table__.insert(), chunk)
+            total += len(chunk)
+        logger.info(f"Derived {total} identity keys")
+        return total
+
+    def _iter_key_rows(self, session) -> Iterator[List[Dict[str, Any]]]:
+        chunk = []
+        users = session.query(User.id, User.login_id, User.email, User.raw_data)\
+            .execution_options(stream_results=True)\
+            .yield_per(WRITE_CHUNK_SIZE)
+        for user_id, login_id, email, raw_data in users:
+            for key_type, key_value in self.blocking_keys(login_id, email, raw_data):
+                chunk.append({'user_id': user_id, 'key_type': key_type, 'key_value': key_value})
+            if len(chunk) >= WRITE_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def cluster(self, session) -> Dict[str, int]:
+        """
+        Group users sharing any blocking key into clusters. Candidate pairs only
+        come from users within the same block, so the work is linear in the
+        number of keys rather than quadratic in the number of users.
+        """
+        blocks = session.query(
+            IdentityKey.key_type,
+            func.array_agg(IdentityKey.user_id)
+        ).group_by(IdentityKey.key_type, IdentityKey.key_value)\
+            .having(func.count(IdentityKey.user_id) > 1)
+
+        sets = UnionFind()
+        links = []
+        skipped = 0
+        for key_type, user_ids in blocks.yield_per(WRITE_CHUNK_SIZE):
+            if len(user_ids) > MAX_BLOCK_SIZE:
+                skipped += 1
+                continue
+            first = user_ids[0]
+            for user_id in user_ids[1:]:
+                sets.union(first, user_id)
+            links.append((key_type, first))
+        if skipped:
+            logger.warning(f"Skipped {skipped} blocking keys shared by more than {MAX_BLOCK_SIZE} users")
+
+        matched_on: Dict[int, set] = {}
+        for key_type, user_id in links:
+            matched_on.setdefault(sets.find(user_id), set()).add(key_type)
+
+        members: Dict[int, List[int]] = {}
+        for user_id in sets.parent:
+            members.setdefault(sets.find(user_id), []).append(user_id)
+
+        session.query(DuplicateClusterMember).delete(synchronize_session=False)
+        chunk = []
+        for root, user_ids in members.items():
+            cluster_id = min(user_ids)
+            reasons = ','.join(k for k in KEY_TYPES if k in matched_on[root])
+            for user_id in user_ids:
+                chunk.append({
+                    'user_id': user_id,
+                    'cluster_id': cluster_id,
+                    'cluster_size': len(user_ids),
+                    'matched_on': reasons
+                })
+            if len(chunk) >= WRITE_CHUNK_SIZE:
+                session.execute(DuplicateClusterMember.__table__.insert(), chunk)
+                chunk = []
+        if chunk:
+            session.execute(DuplicateClusterMember.__table__.insert(), chunk)
+
+        result = {'clusters': len(members), 'duplicate_users': len(sets.parent)}
+        logger.info(f"Identity resolution found {result['clusters']} clusters "
+                    f"covering {result['duplicate_users']} users")
+        return result
+
+    def resolve(self, session) -> Dict[str, int]:
+        """Rebuild keys and clusters; the caller commits"""
+        keys = self.refresh_keys(session)
+        return dict(self.cluster(session), keys=keys)
+
+    def get_duplicates(self, session, page: int = 1, per_page: int = 20,
+                       min_size: int = 2) -> Dict[str, Any]:
+        """Page through the pre-computed clusters, largest first"""
+        if page < 1 or per_page < 1:
+            raise ValueError("page and per_page must be positive")
+        clusters = session.query(
+            DuplicateClusterMember.cluster_id,
+            DuplicateClusterMember.cluster_size,
+            DuplicateClusterMember.matched_on
+        ).filter(DuplicateClusterMember.cluster_size >= min_size).distinct()
+        total = clusters.count()
+        page_rows = clusters.order_by(
+            DuplicateClusterMember.cluster_size.desc(),
+            DuplicateClusterMember.cluster_id
+        ).offset((page - 1) * per_page).limit(per_page).all()
+
+        users_by_cluster: Dict[int, List[Dict[str, Any]]] = {}
+        if page_rows:
+            rows = session.query(DuplicateClusterMember.cluster_id, User)\
+                .join(User, User.id == DuplicateClusterMember.user_id)\
+                .filter(DuplicateClusterMember.cluster_id.in_([row.cluster_id for row in page_rows]))\
+                .order_by(User.id)
+            for cluster_id, user in rows:
+                users_by_cluster.setdefault(cluster_id, []).append(user.to_dict())
+
+        return {
+            'clusters': [{
+                'cluster_id': row.cluster_id,
+                'size': row.cluster_size,
+                'matched_on': row.matched_on.split(','),
+                'users': users_by_cluster.get(row.cluster_id, [])
+            } for row in page_rows],
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page
+        }
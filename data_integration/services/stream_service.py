@@ -0,0 +1,173 @@
+'''
+Service publishing live dashboard updates.
+Sync and ingestion code publish compact deltas through PostgreSQL NOTIFY;
+a single listener per API process fans them out to Server-Sent Events clients.
+'''
+
+"""
+Live update publishing and fan-out
+"""
+from collections import deque
+import itertools
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+from sqlalchemy import text
+from ..database.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'dashboard_updates'
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 512
+LISTEN_POLL_INTERVAL = 5.0
+
+
+def publish(session, message_type: str, data: Dict[str, Any]):
+    """
+    Queue a delta for delivery when the session's transaction commits.
+    Rolled back transactions publish nothing.
+    """
+    payload = json.dumps({'type': message_type, 'data': data}, separators=(',', ':'), default=str)
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+        logger.warning(f"Dropping oversized {message_type} update ({len(payload)} bytes)")
+        return
+    session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                    {'channel': NOTIFY_CHANNEL, 'payload': payload})
+
+
+class StreamBroker:
+    """
+    Fans out NOTIFY messages from one listening connection to any number
+    of subscribers. Slow subscribers lose their oldest messages rather than
+    blocking the listener; recent messages are kept for Last-Event-ID replay.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._subscribers = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._ids = itertools.count(1)
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stream-listener', daemon=True)
+                self._thread.start()
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if last_event_id is not None:
+                for message in self._recent:
+                    if message['id'] > last_event_id:
+                        subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def add_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        """Register an in-process consumer called for every message"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def dispatch(self, payload: str):
+        """Deliver one raw NOTIFY payload to every subscriber"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed stream payload")
+            return
+        with self._lock:
+            message['id'] = next(self._ids)
+            self._recent.append(message)
+            subscribers = list(self._subscribers)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"Stream callback error: {e}")
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                self._listen()
+                backoff = 1
+            except Exception as e:
+                logger.error(f"Stream listener error, reconnecting in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = connection.connection
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            logger.info(f"Listening for updates on {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([dbapi_connection], [], [], LISTEN_POLL_INTERVAL) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self.dispatch(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.invalidate()
+
+
+def format_sse(message: Dict[str, Any]) -> str:
+    """Encode a broker message as a Server-Sent Events frame"""
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_stream_broker() -> StreamBroker:
+    """Return the process-wide broker, starting its listener on first use"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = StreamBroker(get_engine())
+            _broker.start()
+        return _broker
+
+
+def users_delta(added: int, updated: int, processed: int, total: Optional[int],
+                login_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Compact payload describing one committed sync chunk"""
+    data = {'added': added, 'updated': updated, 'processed': processed, 'total': total}
+    if login_ids:
+        # A sample of IDs keeps the payload well under the NOTIFY limit
+        data['login_ids'] = login_ids[:50]
+    return data
@@ -0,0 +1,116 @@
+'''
+Tests for the HyperLogLog sketches stored with the activity rollups and for
+the range decomposition used to merge them.
+'''
+
+from datetime import datetime
+import random
+import numpy as np
+import pytest
+from data_integration.services.activity_service import decompose_range, next_bucket
+from data_integration.utils.hyperloglog import HyperLogLog
+
+
+def login_ids(count, seed=0):
+    rng = random.Random(seed)
+    return [f"user-{rng.getrandbits(64):016x}" for _ in range(count)]
+
+
+@pytest.mark.parametrize('cardinality', [10, 100, 1000, 10000, 100000])
+def test_estimate_within_error_bound(cardinality):
+    values = login_ids(cardinality, seed=cardinality)
+    sketch = HyperLogLog()
+    sketch.add_many(values)
+    error = abs(sketch.count() - len(set(values))) / len(set(values))
+    assert error <= 3 * sketch.relative_error
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_duplicates_do_not_change_estimate():
+    values = login_ids(5000)
+    once, twice = HyperLogLog(), HyperLogLog()
+    once.add_many(values)
+    twice.add_many(values + values)
+    assert once.count() == twice.count()
+
+
+def test_merge_equals_union():
+    values = login_ids(20000)
+    # Overlapping slices, like users active on several days
+    parts = [values[:12000], values[8000:], values[::3]]
+    merged = HyperLogLog()
+    for part in parts:
+        sketch = HyperLogLog()
+        sketch.add_many(part)
+        merged.merge(sketch)
+    union = HyperLogLog()
+    union.add_many(values)
+    assert np.array_equal(merged.registers, union.registers)
+    assert merged.count() == union.count()
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
+
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog()
+    sketch.add_many(login_ids(3000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == sketch.precision
+    assert np.array_equal(restored.registers, sketch.registers)
+    assert restored.count() == sketch.count()
+
+
+def test_empty_range():
+    start = datetime(2024, 3, 1)
+    assert decompose_range(start, start) == {'hour': [], 'day': [], 'month': []}
+    assert decompose_range(start, datetime(2024, 2, 1)) == {'hour': [], 'day': [], 'month': []}
+
+
+def test_whole_month_uses_one_bucket():
+    assert decompose_range(datetime(2024, 2, 1), datetime(2024, 3, 1)) == {
+        'hour': [], 'day': [], 'month': [datetime(2024, 2, 1)]
+    }
+
+
+def test_range_within_one_day_uses_hours():
+    result = decompose_range(datetime(2024, 3, 5, 22), datetime(2024, 3, 6, 2))
+    assert result['hour'] == [datetime(2024, 3, 5, h) for h in (22, 23)] + \
+        [datetime(2024, 3, 6, h) for h in (0, 1)]
+    assert result['day'] == [] and result['month'] == []
+
+
+def test_month_edges_use_days_and_hours():
+    start, end = datetime(2024, 1, 30, 20), datetime(2024, 4, 2, 3)
+    result = decompose_range(start, end)
+    assert result['month'] == [datetime(2024, 2, 1), datetime(2024, 3, 1)]
+    assert result['day'] == [datetime(2024, 1, 31), datetime(2024, 4, 1)]
+    assert result['hour'] == [datetime(2024, 1, 30, h) for h in range(20, 24)] + \
+        [datetime(2024, 4, 2, h) for h in range(3)]
+
+
+def test_year_boundary():
+    result = decompose_range(datetime(2023, 12, 1), datetime(2024, 1, 2))
+    assert result['month'] == [datetime(2023, 12, 1)]
+    assert result['day'] == [datetime(2024, 1, 1)]
+    assert result['hour'] == []
+
+
+@pytest.mark.parametrize('start,end', [
+    (datetime(2024, 1, 30, 20), datetime(2024, 4, 2, 3)),
+    (datetime(2023, 12, 31, 23), datetime(2024, 1, 1, 1)),
+    (datetime(2024, 2, 28), datetime(2024, 3, 1)),
+])
+def test_buckets_tile_the_range(start, end):
+    spans = sorted(
+        (bucket, next_bucket(bucket, granularity))
+        for granularity, buckets in decompose_range(start, end).items()
+        for bucket in buckets
+    )
+    assert spans[0][0] == start and spans[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
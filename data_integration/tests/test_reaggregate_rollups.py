@@ -0,0 +1,81 @@
+'''
+Tests for the rollup re-aggregation script, run against an in-memory SQLite
+database through its command-line entry point.
+'''
+
+from datetime import datetime
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.pool import StaticPool
+from data_integration.database import database
+from data_integration.database.models import Base, User, Event, ActivityRollup
+from data_integration.scripts import reaggregate_rollups
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine, tables=[User.__table__, ActivityRollup.__table__])
+    # SQLite cannot autoincrement the composite primary key; the tests set ids
+    events = Event.__table__.to_metadata(MetaData())
+    events.c.id.autoincrement = False
+    events.create(engine)
+    monkeypatch.setattr(database, '_engine', engine)
+    database.Session.remove()
+    session = database.Session()
+    session.add_all([
+        User(login_id='alice', country='US', user_roles='user,admin'),
+        User(login_id='bob', country='DE', user_roles='user'),
+    ])
+    session.add_all([
+        Event(id=1, login_id='alice', event_type='login', occurred_at=datetime(2026, 1, 5, 9, 30)),
+        Event(id=2, login_id='alice', event_type='view', occurred_at=datetime(2026, 1, 5, 9, 45)),
+        Event(id=3, login_id='bob', event_type='login', occurred_at=datetime(2026, 1, 5, 10, 15)),
+        Event(id=4, login_id='bob', event_type='login', occurred_at=datetime(2026, 1, 6, 8, 0)),
+    ])
+    session.commit()
+    yield session
+    database.Session.remove()
+    engine.dispose()
+
+
+def rollups(session, granularity):
+    rows = session.query(ActivityRollup).filter(ActivityRollup.granularity == granularity)
+    return sorted((r.bucket_start, r.country, r.role, r.event_count, r.active_users) for r in rows)
+
+
+def test_rebuilds_listed_buckets(session, capsys):
+    # A stale cell that the rebuild replaces
+    session.add(ActivityRollup(granularity='day', bucket_start=datetime(2026, 1, 5), country='US',
+                               role='admin,user', event_count=99, active_users=9))
+    session.commit()
+
+    assert reaggregate_rollups.main(['--granularity', 'day', '--bucket', '2026-01-05T12:00:00']) == 0
+    assert '"cells": 2' in capsys.readouterr().out
+    assert rollups(session, 'day') == [
+        (datetime(2026, 1, 5), 'DE', 'user', 1, 1),
+        (datetime(2026, 1, 5), 'US', 'admin,user', 2, 1),
+    ]
+    assert rollups(session, 'hour') == []
+
+
+def test_rebuilds_every_granularity_in_range(session):
+    assert reaggregate_rollups.main(['--start', '2026-01-05T00:00:00Z', '--end', '2026-01-07']) == 0
+    assert len(rollups(session, 'hour')) == 3
+    assert [r[0] for r in rollups(session, 'day')] == [datetime(2026, 1, 5)] * 2 + [datetime(2026, 1, 6)]
+    assert rollups(session, 'month') == [
+        (datetime(2026, 1, 1), 'DE', 'user', 2, 1),
+        (datetime(2026, 1, 1), 'US', 'admin,user', 2, 1),
+    ]
+
+
+@pytest.mark.parametrize('argv', [
+    ['--bucket', '2026-01-05'],
+    ['--start', '2026-01-05'],
+    ['--start', '2026-01-07', '--end', '2026-01-05'],
+    ['--granularity', 'day', '--bucket', 'yesterday'],
+])
+def test_rejects_invalid_arguments(argv):
+    with pytest.raises(SystemExit) as exit_info:
+        reaggregate_rollups.main(argv)
+    assert exit_info.value.code == 2
@@ -3,3 +3,137 @@ Utilities for managing cached data and pre-aggregated reports.
 Handles cache invalidation, update strategies, and optimization.
 '''
 
+"""
+Pre-computed user cube backing the drill-down analytics API
+"""
+from datetime import datetime
+from itertools import combinations
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import func
+from ..database.models import User, UserCube
+from ..services.activity_service import normalize_roles
+
+logger = logging.getLogger(__name__)
+
+# Dimensions available for drill-down, in their canonical order
+CUBE_DIMENSIONS = ('country', 'role', 'signup_month')
+ROLE_INDEX = CUBE_DIMENSIONS.index('role')
+
+
+def grouping_key(dimensions) -> str:
+    """Canonical key of a grouping set, independent of drill order"""
+    return ','.join(d for d in CUBE_DIMENSIONS if d in dimensions)
+
+
+def _signup_month_expression(session):
+    if session.bind.dialect.name == 'sqlite':
+        return func.strftime('%Y-%m', User.created_time)
+    return func.to_char(User.created_time, 'YYYY-MM')
+
+
+def refresh_user_cube(session) -> int:
+    """
+    Rebuild every grouping set of the cube.
+
+    The database only groups by the raw (country, user_roles, signup month)
+    triple; role sets are normalized and the coarser grouping sets are rolled
+    up from that small result in Python. The cube is replaced in the caller's
+    transaction, so readers never see a partial refresh.
+
+    The role dimension means membership, as the role filter of /api/activity
+    does: a user with roles "admin,user" counts in both the "admin" and the
+    "user" cell, so role cells may sum to more than their parent.
+    """
+    finest: Dict[Tuple[str, str, str], int] = {}
+    rows = session.query(User.country, User.user_roles,
+                         _signup_month_expression(session), func.count(User.id))\
+        .group_by(User.country, User.user_roles, _signup_month_expression(session))\
+        .all()
+    for country, user_roles, signup_month, count in rows:
+        key = (country or '', normalize_roles(user_roles), signup_month or '')
+        finest[key] = finest.get(key, 0) + count
+
+    cells: Dict[Tuple[str, Tuple], int] = {}
+    for size in range(len(CUBE_DIMENSIONS) + 1):
+        for grouped in combinations(range(len(CUBE_DIMENSIONS)), size):
+            grouping = grouping_key([CUBE_DIMENSIONS[i] for i in grouped])
+            for (country, role_set, signup_month), count in finest.items():
+                roles = (role_set.split(',') if role_set else ['']) if ROLE_INDEX in grouped else [None]
+                for role in roles:
+                    values = (country, role, signup_month)
+                    cell = tuple(values[i] if i in grouped else None
+                                 for i in range(len(CUBE_DIMENSIONS)))
+                    cells[(grouping, cell)] = cells.get((grouping, cell), 0) + count
+
+    refreshed_at = datetime.utcnow()
+    session.query(UserCube).delete(synchronize_session=False)
+    session.bulk_insert_mappings(UserCube, [
+        {
+            'grouping': grouping,
+            'country': country,
+            'role': role,
+            'signup_month': signup_month,
+            'user_count': count,
+            'refreshed_at': refreshed_at
+        }
+        for (grouping, (country, role, signup_month)), count in cells.items()
+    ])
+    logger.info(f"Refreshed user cube: {len(cells)} cells from {len(finest)} base groups")
+    return len(cells)
+
+
+def get_drilldown(session, dimensions: List[str],
+                  selections: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Return counts at each level of an ordered drill path.
+
+    Level k breaks down the k-th dimension, restricted to the values
+    selected for the dimensions before it; unselected ones are expanded.
+    Each level is a single indexed lookup of one grouping set, so raw
+    user rows are never read.
+    """
+    unknown = [d for d in dimensions if d not in CUBE_DIMENSIONS]
+    if unknown or len(set(dimensions)) != len(dimensions):
+        raise ValueError(f"dimensions must be distinct values from {', '.join(CUBE_DIMENSIONS)}")
+    selections = selections or {}
+
+    levels = []
+    for depth in range(len(dimensions) + 1):
+        grouped = dimensions[:depth]
+        query = session.query(UserCube).filter(UserCube.grouping == grouping_key(grouped))
+        path = {}
+        for dimension in grouped[:-1]:
+            if dimension in selections:
+                query = query.filter(getattr(UserCube, dimension) == selections[dimension])
+                path[dimension] = selections[dimension]
+        cells = [
+            dict({d: getattr(cell, d) for d in grouped}, users=cell.user_count)
+            for cell in query.order_by(UserCube.user_count.desc()).all()
+        ]
+        levels.append({
+            'dimension': grouped[-1] if grouped else None,
+            'path': path,
+            'cells': cells
+        })
+
+    refreshed_at = session.query(func.max(UserCube.refreshed_at)).scalar()
+    return {
+        'dimensions': dimensions,
+        'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+        'levels': levels
+    }
+
+
+def cube_summary(session, limit: int = 20) -> Dict[str, Any]:
+    """Compact headline numbers from the cube for live dashboard updates"""
+    total = session.query(UserCube.user_count).filter(UserCube.grouping == '').scalar()
+    countries = session.query(UserCube.country, UserCube.user_count)\
+        .filter(UserCube.grouping == grouping_key(['country']))\
+        .order_by(UserCube.user_count.desc())\
+        .limit(limit)\
+        .all()
+    return {
+        'total_users': total or 0,
+        'countries': {country: count for country, count in countries}
+    }
@@ -0,0 +1,180 @@
+'''
+HTTP caching utilities for the API.
+Tracks data generations bumped on commit, answers conditional GETs
+without touching the database and compresses large responses.
+'''
+
+"""
+Generation-keyed ETags and response compression
+"""
+from datetime import datetime
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from flask import request, current_app, make_response
+from sqlalchemy.dialects.postgresql import insert
+from ..config.settings import GENERATION_CACHE_TTL, COMPRESSION_MIN_SIZE
+from ..database.database import Session
+from ..database.models import DataGeneration
+from ..services.stream_service import publish, get_stream_broker
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/css', 'text/plain')
+
+
+def bump_generation(session, scope: str) -> int:
+    """
+    Increment a scope's generation in the caller's transaction and announce
+    it to API processes once the transaction commits
+    """
+    table = DataGeneration.__table__
+    statement = insert(table).values(scope=scope, generation=1, updated_at=datetime.utcnow())
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.scope],
+        set_={'generation': table.c.generation + 1, 'updated_at': statement.excluded.updated_at}
+    ).returning(table.c.generation)
+    generation = session.execute(statement).scalar()
+    publish(session, 'generation', {'scope': scope, 'generation': generation})
+    return generation
+
+
+class GenerationCache:
+    """
+    Process-local view of the current generations.
+
+    Updated immediately from stream notifications and re-read from the
+    database at most once per ttl seconds, which bounds staleness if a
+    notification is missed while the listener reconnects.
+    """
+
+    def __init__(self, ttl: float = GENERATION_CACHE_TTL):
+        self.ttl = ttl
+        self._values: Dict[str, int] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, scope: str) -> int:
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+        if stale:
+            self.reload()
+        with self._lock:
+            return self._values.get(scope, 0)
+
+    def reload(self):
+        session = Session()
+        try:
+            values = dict(session.query(DataGeneration.scope, DataGeneration.generation).all())
+        finally:
+            session.close()
+        with self._lock:
+            for scope, generation in values.items():
+                self._values[scope] = max(generation, self._values.get(scope, 0))
+            self._loaded_at = time.monotonic()
+
+    def on_message(self, message):
+        if message.get('type') != 'generation':
+            return
+        data = message['data']
+        with self._lock:
+            self._values[data['scope']] = max(data['generation'], self._values.get(data['scope'], 0))
+
+
+_generations = None
+_generations_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    global _generations
+    with _generations_lock:
+        if _generations is None:
+            _generations = GenerationCache()
+            get_stream_broker().add_callback(_generations.on_message)
+        return _generations
+
+
+def generation_scope(scope: str):
+    """Mark a view as cacheable until the given data scope changes"""
+    def decorator(view):
+        view.generation_scope = scope
+        return view
+    return decorator
+
+
+def _view_scope() -> Optional[str]:
+    if request.method != 'GET' or request.endpoint is None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'generation_scope', None)
+
+
+def _compute_etag(scope: str) -> str:
+    generation = get_generation_cache().get(scope)
+    params = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    # The date is included because views default their ranges relative to today
+    key = f"{scope}:{generation}:{datetime.utcnow():%Y-%m-%d}:{request.path}?{params}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def check_not_modified():
+    """before_request hook: answer 304 for unchanged data without running the view"""
+    scope = _view_scope()
+    if scope is None:
+        return None
+    try:
+        etag = _compute_etag(scope)
+    except Exception as e:
+        # Let the view run (and report its own errors) without an ETag
+        logger.error(f"Error reading the {scope} generation: {e}")
+        return None
+    request.environ['data_integration.etag'] = etag
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def add_etag(response):
+    """after_request hook: tag successful cacheable responses"""
+    etag = request.environ.get('data_integration.etag')
+    if etag and response.status_code == 200:
+        try:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+        except Exception as e:
+            logger.error(f"Error tagging response: {e}")
+    return response
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli-encode large text responses"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return response
+
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br']:
+        response.set_data(brotli.compress(data, quality=4))
+        response.headers['Content-Encoding'] = 'br'
+    elif encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
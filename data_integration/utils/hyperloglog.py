@@ -0,0 +1,107 @@
+'''
+HyperLogLog sketches for approximate distinct counting.
+Used to store mergeable per-bucket distinct-user counts alongside
+the activity rollups.
+'''
+
+"""
+Pure Python/NumPy HyperLogLog implementation
+"""
+import hashlib
+import math
+import zlib
+from typing import Iterable, Optional
+import numpy as np
+
+DEFAULT_PRECISION = 12
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def hash64(value: str) -> int:
+    """Stable 64-bit hash of a string value"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length() for uint64 arrays"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # Each half fits in a float64 mantissa, so frexp gives exact exponents
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high_bits > 0, high_bits + 32, low_bits)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch with 2**precision one-byte registers.
+
+    The standard error of the estimate is about 1.04 / sqrt(2**precision):
+    1.6% for the default precision of 12 (4 KiB of registers), so roughly
+    95% of estimates fall within 3.3% of the exact count. Merging sketches
+    is lossless, so the bound also holds for unions of any number of buckets.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[np.ndarray] = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        elif registers.shape != (self.m,):
+            raise ValueError("register array does not match precision")
+        self.registers = registers
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of count() relative to the true cardinality"""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str):
+        self.add_hashes(np.array([hash64(value)], dtype=np.uint64))
+
+    def add_many(self, values: Iterable[str]):
+        hashes = np.fromiter((hash64(v) for v in values), dtype=np.uint64)
+        if hashes.size:
+            self.add_hashes(hashes)
+
+    def add_hashes(self, hashes: np.ndarray):
+        """Fold an array of 64-bit hashes into the registers"""
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        remainder = hashes << p
+        rank = (64 - _bit_length(remainder) + 1).clip(max=64 - self.precision + 1)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Merge another sketch into this one in place"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        """Estimate the number of distinct values added"""
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a precision byte followed by zlib-compressed registers"""
+        return bytes([self.precision]) + zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        precision = data[0]
+        registers = np.frombuffer(zlib.decompress(data[1:]), dtype=np.uint8).copy()
+        return cls(precision, registers)
@@ -3,3 +3,199 @@ Performance optimization utilities and monitoring tools.
 Includes query optimization, memory management, and performance metrics.
 '''
 
+
+"""
+Performance utilities
+"""
+from contextlib import contextmanager, nullcontext
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+
+
+class RateLimiter:
+    """Spaces out calls to at most `rate` per second; safe to share between threads"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Block until the next call is allowed; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + self.interval
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+# tracemalloc peaks are process-wide and reset per stage, so profilers
+# running concurrently would clobber each other's numbers
+_active_profiler = threading.Lock()
+
+
+def _traced_peak() -> int:
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; stages cost one method call"""
+    enabled = False
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class SyncProfiler:
+    """
+    Opt-in profile of one sync thread: wall and CPU time per stage, DB round
+    trips (statements and commits) per stage, and peak traced memory.
+    Stages nest; a nested stage is reported as "parent.child" and its time is
+    also included in the parent.
+
+    With sample_interval set, a sampler thread also records the thread's
+    Python stacks, exported in the collapsed format flamegraph.pl and
+    speedscope read. Memory tracing is process-wide, so only one profiler may
+    run at a time; start() raises RuntimeError otherwise.
+    """
+    enabled = True
+
+    def __init__(self, engine, label: str = 'sync', sample_interval: Optional[float] = None):
+        self.engine = engine
+        self.label = label
+        self.sample_interval = sample_interval
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.stacks: Dict[str, int] = {}
+        self._stack: List[str] = []
+        self._thread_id = None
+        self._started = None
+        self._stopped = None
+        self._peak = 0
+        self._owns_tracemalloc = False
+        self._open_stages: List[Dict[str, float]] = []
+        self._round_trips = 0
+        self._sampler = None
+        self._sampling = threading.Event()
+
+    def start(self):
+        if not _active_profiler.acquire(blocking=False):
+            raise RuntimeError("Another SyncProfiler is running; profile one sync at a time")
+        self._thread_id = threading.get_ident()
+        self._started = (time.perf_counter(), time.thread_time())
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        event.listen(self.engine, 'before_cursor_execute', self._on_round_trip)
+        event.listen(self.engine, 'commit', self._on_round_trip)
+        if self.sample_interval:
+            self._sampling.set()
+            self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.label}", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        self._stopped = (time.perf_counter(), time.thread_time())
+        self._peak = max(self._peak, _traced_peak())
+        event.remove(self.engine, 'before_cursor_execute', self._on_round_trip)
+        event.remove(self.engine, 'commit', self._on_round_trip)
+        if self._sampler is not None:
+            self._sampling.clear()
+            self._sampler.join()
+            self._sampler = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        _active_profiler.release()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        self._stack.append(name)
+        key = '.'.join(self._stack)
+        stats = self.stages.get(key)
+        if stats is None:
+            stats = self.stages[key] = {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'round_trips': 0, 'peak': 0}
+        self._open_stages.append(stats)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            stats['wall'] += time.perf_counter() - wall
+            stats['cpu'] += time.thread_time() - cpu
+            stats['calls'] += 1
+            # Peak since the last stage boundary; it also counts for every enclosing
+            # stage, which would otherwise lose it to the reset below
+            peak = _traced_peak()
+            for open_stats in self._open_stages:
+                open_stats['peak'] = max(open_stats['peak'], peak)
+            self._peak = max(self._peak, peak)
+            tracemalloc.reset_peak()
+            self._open_stages.pop()
+            self._stack.pop()
+
+    def _on_round_trip(self, *args, **kwargs):
+        if threading.get_ident() != self._thread_id:
+            return
+        self._round_trips += 1
+        for depth in range(1, len(self._stack) + 1):
+            self.stages['.'.join(self._stack[:depth])]['round_trips'] += 1
+
+    def _sample(self):
+        while self._sampling.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                path = ';'.join([self.label] + list(self._stack) + frames[::-1])
+                self.stacks[path] = self.stacks.get(path, 0) + 1
+            time.sleep(self.sample_interval)
+
+    def summary(self) -> Dict[str, Any]:
+        end = self._stopped or (time.perf_counter(), time.thread_time())
+        peak = self._peak if self._stopped else max(self._peak, _traced_peak())
+        return {
+            'wall_seconds': round(end[0] - self._started[0], 4),
+            'cpu_seconds': round(end[1] - self._started[1], 4),
+            'db_round_trips': self._round_trips,
+            'peak_memory_mb': round(peak / 1e6, 2),
+            'stages': {
+                name: {
+                    'wall_seconds': round(stats['wall'], 4),
+                    'cpu_seconds': round(stats['cpu'], 4),
+                    'calls': stats['calls'],
+                    'db_round_trips': stats['round_trips'],
+                    'peak_memory_mb': round(stats['peak'] / 1e6, 2)
+                }
+                for name, stats in self.stages.items()
+            }
+        }
+
+
+def write_collapsed_stacks(path: str, profilers: List[SyncProfiler]) -> int:
+    """Write sampled stacks as "frame;frame;... count" lines; returns the sample count"""
+    samples = 0
+    with open(path, 'w') as f:
+        for profiler in profilers:
+            for stack, count in sorted(profiler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+                samples += count
+    return samples
@@ -12,6 +12,20 @@ interface User {
   last_sync: string;
 }
 
+interface UsersDelta {
+  added: number;
+  updated: number;
+  processed: number;
+  total: number | null;
+}
+
+interface AggregatesUpdate {
+  total_users: number;
+}
+
+const API_URL = 'http://127.0.0.1:5002';
+const PER_PAGE = 50;
+
 interface PaginatedResponse {
   users: User[];
   total: number;
@@ -27,15 +41,36 @@ export function UserList() {
   const [page, setPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
   const [totalUsers, setTotalUsers] = useState(0);
+  const [changedUsers, setChangedUsers] = useState(0);
+  const [syncProgress, setSyncProgress] = useState<UsersDelta | null>(null);
+  const [refreshKey, setRefreshKey] = useState(0);
+
+  // Live updates are pushed by the server; the list is only refetched on request
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/api/stream`);
+    source.addEventListener('users', (event) => {
+      const delta: UsersDelta = JSON.parse((event as MessageEvent).data);
+      setChangedUsers((count) => count + delta.added + delta.updated);
+      setSyncProgress(delta);
+    });
+    source.addEventListener('aggregates', (event) => {
+      const update: AggregatesUpdate = JSON.parse((event as MessageEvent).data);
+      setTotalUsers(update.total_users);
+      setTotalPages(Math.max(1, Math.ceil(update.total_users / PER_PAGE)));
+    });
+    source.addEventListener('sync', () => setSyncProgress(null));
+    return () => source.close();
+  }, []);
 
   useEffect(() => {
     const fetchUsers = async () => {
       try {
         setLoading(true);
-        const response = await axios.get<PaginatedResponse>(`http://127.0.0.1:5002/api/users?page=${page}&per_page=50`);
+        const response = await axios.get<PaginatedResponse>(`${API_URL}/api/users?page=${page}&per_page=${PER_PAGE}`);
         setUsers(response.data.users);
         setTotalPages(response.data.total_pages);
         setTotalUsers(response.data.total);
+        setChangedUsers(0);
         setError(null);
       } catch (err) {
         setError('Failed to fetch users');
@@ -46,7 +81,7 @@ export function UserList() {
     };
 
     fetchUsers();
-  }, [page]);
+  }, [page, refreshKey]);
 
   if (loading) {
     return (
@@ -76,6 +111,22 @@ export function UserList() {
         </Box>
         <Text color="gray">Showing {users.length} users per page</Text>
       </Flex>
+
+      {(syncProgress || changedUsers > 0) && (
+        <Flex gap="3" align="center" mb="4">
+          {syncProgress && (
+            <Text color="gray">
+              Syncing: {syncProgress.processed}
+              {syncProgress.total !== null && ` of ${syncProgress.total}`} users
+            </Text>
+          )}
+          {changedUsers > 0 && (
+            <Button variant="soft" onClick={() => setRefreshKey((key) => key + 1)}>
+              {changedUsers} users changed, refresh
+            </Button>
+          )}
+        </Flex>
+      )}
       
       <Box mb="6">
         <div className="grid gap-4 md:grid-cols-2 lg:grid-cols-3">
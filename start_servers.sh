@@ -26,6 +26,10 @@ if check_port 5174; then
     lsof -ti:5174 | xargs kill -9 2>/dev/null
 fi
 
+# Apply database migrations
+echo -e "${GREEN}Applying database migrations...${NC}"
+PYTHONPATH=/Users/gnir/NewDashboard python -m data_integration.database.migrations || exit 1
+
 # Start the backend server
 echo -e "${GREEN}Starting backend server...${NC}"
 PYTHONPATH=/Users/gnir/NewDashboard python data_integration/app.py &
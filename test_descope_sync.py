@@ -1,6 +1,7 @@
 """
 Test script for Descope data synchronization
 """
+import argparse
 import os
 import sys
 import logging
@@ -20,8 +21,10 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 from data_integration.database.database import init_db
-from data_integration.services.descope_service import DescopeService
+from data_integration.services.data_sync_service import DataSyncService
 from data_integration.database.models import User
+from data_integration.services.data_quality_service import DataQualityService
+from data_integration.utils.performance import write_collapsed_stacks
 
 def analyze_user_without_email(user_data):
     """Analyze user data to understand why email extraction failed"""
@@ -36,7 +39,7 @@ def analyze_user_without_email(user_data):
 
 def show_synced_users():
     """Display the users that have been synced to the database"""
-    from sqlalchemy import create_engine
+    from sqlalchemy import create_engine, or_
     from sqlalchemy.orm import sessionmaker
     from data_integration.config.settings import DATABASE_URL
     
@@ -44,8 +47,10 @@ def show_synced_users():
     Session = sessionmaker(bind=engine)
     session = Session()
     
-    users = session.query(User).all()
-    total_users = len(users)
+    # Metrics come from the columnar report the sync records, not a row-by-row scan
+    snapshots = DataQualityService.history(session, limit=1)
+    report = snapshots[0]['metrics'] if snapshots else DataQualityService(snapshot_dir=None).report(session)
+    total_users = report['total_users']
     
     if total_users == 0:
         print("\nNo users found in database.")
@@ -57,65 +62,85 @@ def show_synced_users():
     print(f"{'Login ID':<30} {'Email':<30} {'Country':<15} {'Roles':<25}")
     print("-" * 100)
     
-    empty_email_count = 0
-    empty_country_count = 0
-    empty_roles_count = 0
-    users_without_email = []
+    # Print first 10 users as sample
+    for user in session.query(User).order_by(User.id).limit(10):
+        print(f"{user.login_id[:30]:<30} {(user.email or '')[:30]:<30} "
+              f"{(user.country or '')[:15]:<15} {(user.user_roles or '')[:25]:<25}")
     
-    for user in users:
-        if not user.email:
-            empty_email_count += 1
-            if len(users_without_email) < 5:  # Store first 5 users without email
-                try:
-                    raw_data = user.raw_data
-                    if isinstance(raw_data, str):
-                        raw_data = json.loads(raw_data)
-                    users_without_email.append(analyze_user_without_email(raw_data))
-                except Exception as e:
-                    logger.error(f"Error analyzing user data: {e}")
-        
-        if not user.country:
-            empty_country_count += 1
-        if not user.user_roles:
-            empty_roles_count += 1
-            
-        # Print first 10 users as sample
-        if users.index(user) < 10:
-            print(f"{user.login_id[:30]:<30} {user.email[:30]:<30} {user.country[:15]:<15} {user.user_roles[:25]:<25}")
+    users_without_email = []
+    for user in session.query(User).filter(or_(User.email == None, User.email == '')).limit(5):
+        try:
+            raw_data = user.raw_data
+            if isinstance(raw_data, str):
+                raw_data = json.loads(raw_data)
+            users_without_email.append(analyze_user_without_email(raw_data))
+        except Exception as e:
+            logger.error(f"Error analyzing user data: {e}")
     
+    null_rates = report['null_rates']
     print("-" * 100)
     print("\nData Quality Summary:")
     print(f"Total Users: {total_users}")
+    print(f"Users without email: {null_rates['email']*100:.1f}%")
+    print(f"Users without country: {null_rates['country']*100:.1f}%")
+    print(f"Users without roles: {null_rates['user_roles']*100:.1f}%")
+    print(f"Email sources: {report['email_sources']}")
+    print(f"Duplicate emails: {report['duplicates']['email']['users']} users "
+          f"in {report['duplicates']['email']['groups']} groups")
     
-    if total_users > 0:
-        print(f"Users without email: {empty_email_count} ({empty_email_count/total_users*100:.1f}%)")
-        print(f"Users without country: {empty_country_count} ({empty_country_count/total_users*100:.1f}%)")
-        print(f"Users without roles: {empty_roles_count} ({empty_roles_count/total_users*100:.1f}%)")
-        
-        if users_without_email:
-            print("\nSample of Users Without Email:")
-            print(json.dumps(users_without_email, indent=2))
+    if users_without_email:
+        print("\nSample of Users Without Email:")
+        print(json.dumps(users_without_email, indent=2))
     
     session.close()
 
+def print_profile(profile, title):
+    """Print a per-stage breakdown from a sync profile"""
+    print(f"\n{title}: {profile['wall_seconds']:.2f}s wall, {profile['cpu_seconds']:.2f}s CPU, "
+          f"{profile['db_round_trips']} DB round trips, {profile['peak_memory_mb']:.1f} MB peak")
+    print(f"{'Stage':<30} {'Wall s':>9} {'CPU s':>9} {'Calls':>8} {'DB trips':>9} {'Peak MB':>8}")
+    for name, stage in profile['stages'].items():
+        print(f"{name:<30} {stage['wall_seconds']:>9.3f} {stage['cpu_seconds']:>9.3f} {stage['calls']:>8} "
+              f"{stage['db_round_trips']:>9} {stage['peak_memory_mb']:>8.1f}")
+
 def main():
+    parser = argparse.ArgumentParser(description='Sync Descope users and show a data-quality summary')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record wall/CPU time, DB round trips and peak memory per sync stage '
+                             '(tracemalloc slows the sync down)')
+    parser.add_argument('--flamegraph', metavar='PATH',
+                        help='Sample stacks and write them in collapsed format for flamegraph.pl or speedscope')
+    parser.add_argument('--sample-interval', type=float, default=0.005,
+                        help='Seconds between stack samples with --flamegraph')
+    args = parser.parse_args()
     try:
         # Initialize database
         logger.info("Initializing database...")
         init_db()
         
-        # Initialize Descope service
+        # Sync users of every configured Descope project concurrently
         logger.info("Starting Descope synchronization...")
-        descope_service = DescopeService()
-        
-        # Sync users
-        result = descope_service.sync_users_to_db()
+        sync_service = DataSyncService(
+            profile=args.profile,
+            sample_interval=args.sample_interval if args.flamegraph else None
+        )
+        result = sync_service.sync_all()
         
         # Log results
         logger.info("Synchronization completed:")
         logger.info(f"Total processed: {result['total_processed']}")
         logger.info(f"Successfully synced: {result['synced']}")
         logger.info(f"Errors: {result['errors']}")
+        for project in result['projects']:
+            logger.info(f"Project {project['project_id']}: {project['synced']} synced, "
+                        f"{project['errors']} errors in {project['seconds']}s")
+            if project.get('profile'):
+                print_profile(project['profile'], f"Project {project['project_id']}")
+        if result.get('profile'):
+            print_profile(result['profile'], "Aggregate refresh")
+        if args.flamegraph:
+            samples = write_collapsed_stacks(args.flamegraph, sync_service.profilers)
+            logger.info(f"Wrote {samples} stack samples to {args.flamegraph}")
         
         # Show synced users
         show_synced_users()